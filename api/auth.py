@@ -1,27 +1,41 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
-from passlib.context import CryptContext
 from datetime import datetime, timedelta
-from typing import Optional
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+import hmac
+import os
+import time
 
 from api.models import TokenData, User
 from api.database import get_user_by_username, get_user_by_id
+from api.profiling import span
 
 # to get a secret key run: openssl rand -hex 32
 SECRET_KEY = "09d25e094faa6ca2556c818166b7a9563b93f7099f6f0f4caa6cf63b88e8d3e7"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing. passlib and its bcrypt backend are loaded on first use
+# rather than at import, since most requests never touch a password.
+@lru_cache(maxsize=None)
+def get_pwd_context():
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/token")
+# Same scheme, but lets guests (no Authorization header) through
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/token", auto_error=False)
+
+# Decoded tokens, so repeat reads skip the signature check: token -> (username, exp)
+_token_cache: Dict[str, Tuple[str, float]] = {}
+TOKEN_CACHE_MAX_SIZE = 4096
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 def authenticate_user(username: str, password: str):
     user = get_user_by_username(username)
@@ -40,9 +54,32 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.utcnow() + timedelta(minutes=15)
         
     to_encode.update({"exp": expire})
+    from jose import jwt
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def get_username_from_token(token: str) -> Optional[str]:
+    cached = _token_cache.get(token)
+    if cached is not None:
+        username, expires_at = cached
+        if expires_at > time.time():
+            return username
+        del _token_cache[token]
+
+    from jose import JWTError, jwt
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    username = payload.get("sub")
+    if username is None:
+        return None
+
+    if len(_token_cache) >= TOKEN_CACHE_MAX_SIZE:
+        _token_cache.clear()
+    _token_cache[token] = (username, float(payload.get("exp", 0)))
+    return username
+
 async def get_current_user(token: str = Depends(oauth2_scheme)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -50,17 +87,46 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
+    with span("auth"):
+        username = get_username_from_token(token)
         if username is None:
             raise credentials_exception
         token_data = TokenData(username=username)
-    except JWTError:
-        raise credentials_exception
-        
-    user = get_user_by_username(token_data.username)
+            
+        user = get_user_by_username(token_data.username)
     if user is None:
         raise credentials_exception
         
-    return user
\ No newline at end of file
+    return user
+
+async def get_optional_user(token: Optional[str] = Depends(optional_oauth2_scheme)):
+    # Guests get None; a token that is present but invalid is still rejected
+    if token is None:
+        return None
+    return await get_current_user(token)
+
+# Operational endpoints (profiling) are limited to these accounts,
+# e.g. ADMIN_USERNAMES=alice,bob. Accounts live in memory and registration
+# is open, so a username alone proves nothing: requests must also send the
+# operator-set ADMIN_TOKEN secret in X-Admin-Token. Without ADMIN_TOKEN
+# nobody is an admin.
+ADMIN_USERNAMES = {
+    name.strip() for name in os.environ.get("ADMIN_USERNAMES", "").split(",") if name.strip()
+}
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN") or None
+
+async def get_admin_user(
+    current_user: User = Depends(get_current_user),
+    admin_token: Optional[str] = Header(None, alias="X-Admin-Token")
+):
+    if (
+        ADMIN_TOKEN is None
+        or admin_token is None
+        or not hmac.compare_digest(admin_token.encode(), ADMIN_TOKEN.encode())
+        or current_user["username"] not in ADMIN_USERNAMES
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    return current_user
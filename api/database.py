@@ -1,16 +1,28 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, JSON, ForeignKey
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from array import array
 from datetime import datetime
+from enum import IntEnum
 import os
-from typing import Dict, List, Optional, Union
+import re
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple, Union
+
+from api.deadline import check_deadline
+from api.fiscal_calendar import (
+    RELATIVE_PERIODS, FiscalCalendar, fiscal_period_keys, rebase_periods
+)
+from api.history import EstimateHistory, periods_equal
 
 # In-memory storage for development
 users_db = {}
-earnings_estimates_db = {}
-revenue_estimates_db = {}
-growth_estimates_db = {}
+earnings_estimates_db: Dict[int, "EstimateRecord"] = {}
+revenue_estimates_db: Dict[int, "EstimateRecord"] = {}
+growth_estimates_db: Dict[int, "EstimateRecord"] = {}
 user_id_counter = 1
+# Estimate handlers run on threadpool workers. This lock guards the estimate
+# tables, the ticker id map and record revisions, including their history.
+_estimates_lock = threading.RLock()
 
 # User management functions
 def get_user_by_username(username: str):
@@ -39,62 +51,339 @@ def create_user(username: str, email: str, hashed_password: str):
 def get_all_users():
     return list(users_db.values())
 
-# Estimate management functions
-def save_earnings_estimate(ticker: str, user_id: int, periods: Dict[str, float]):
-    key = f"{ticker}_{user_id}"
-    estimate = {
-        "ticker": ticker,
-        "userId": user_id,
-        "periods": periods,
-        "createdAt": datetime.now(),
-        "updatedAt": datetime.now()
-    }
-    earnings_estimates_db[key] = estimate
-    return estimate
-
-def get_earnings_estimate(ticker: str, user_id: int):
-    key = f"{ticker}_{user_id}"
-    return earnings_estimates_db.get(key)
-
-def save_revenue_estimate(ticker: str, user_id: int, periods: Dict[str, float]):
-    key = f"{ticker}_{user_id}"
-    estimate = {
-        "ticker": ticker,
-        "userId": user_id,
-        "periods": periods,
-        "createdAt": datetime.now(),
-        "updatedAt": datetime.now()
+# Estimate storage
+# Estimates are stored as compact slotted records rather than dicts: period
+# values live in a fixed float array indexed by EstimatePeriod, tickers are
+# interned, timestamps are integer epoch seconds, and the table key is a
+# single int. They are converted back to API dicts only on the way out.
+#
+# Period slots are relative ("nextQtr"), so each record also keeps the fiscal
+# calendar (fiscal_calendar) its values were entered against: the fiscal year
+# end month and the anchor of the then current quarter. Reads pass the
+# ticker's current calendar and get the values re-keyed to it: after a quarter
+# rollover a stored nextQtr comes back as currentQtr, and ended periods drop out.
+# Anchors of different fiscal year ends are not comparable, so values saved
+# under another year end are returned as saved, labeled by their own anchor.
+class EstimatePeriod(IntEnum):
+    CURRENT_QTR = 0
+    NEXT_QTR = 1
+    CURRENT_YEAR = 2
+    NEXT_YEAR = 3
+    NEXT_5_YEARS = 4
+    PAST_5_YEARS = 5
+
+PERIOD_KEYS = RELATIVE_PERIODS
+PERIOD_INDEX = {key: EstimatePeriod(i) for i, key in enumerate(PERIOD_KEYS)}
+
+# Number of periods held per kind; earnings and revenue stop at nextYear
+ESTIMATE_PERIOD_COUNTS = {"earnings": 4, "revenue": 4, "growth": 6}
+
+# Missing periods are stored as NaN
+_MISSING = float("nan")
+
+# Guests (negative user ids) keep a bounded version log; once it grows past
+# the cap the oldest versions are dropped, down to half of it
+MAX_GUEST_HISTORY_VERSIONS = 64
+
+def _unpack_periods(values: array) -> Dict[str, float]:
+    return {
+        PERIOD_KEYS[i]: value
+        for i, value in enumerate(values)
+        if value == value  # skip NaN
     }
-    revenue_estimates_db[key] = estimate
-    return estimate
-
-def get_revenue_estimate(ticker: str, user_id: int):
-    key = f"{ticker}_{user_id}"
-    return revenue_estimates_db.get(key)
-
-def save_growth_estimate(ticker: str, user_id: int, periods: Dict[str, float]):
-    key = f"{ticker}_{user_id}"
-    estimate = {
-        "ticker": ticker,
-        "userId": user_id,
-        "periods": periods,
-        "createdAt": datetime.now(),
-        "updatedAt": datetime.now()
+
+def _unpack_fiscal_periods(values: array, anchor: int) -> Dict[str, str]:
+    # Absolute fiscal period of each period that is set
+    keys = fiscal_period_keys(anchor)
+    return {
+        PERIOD_KEYS[i]: keys[i]
+        for i, value in enumerate(values)
+        if value == value
     }
-    growth_estimates_db[key] = estimate
-    return estimate
 
-def get_growth_estimate(ticker: str, user_id: int):
-    key = f"{ticker}_{user_id}"
-    return growth_estimates_db.get(key)
+class EstimateRecord:
+    # history stays None until the estimate is first revised, so estimates
+    # that are saved once carry no version log
+    __slots__ = (
+        "ticker", "user_id", "fiscal_year_end_month", "anchor", "values",
+        "created_at", "updated_at", "history"
+    )
+
+    def __init__(
+        self,
+        ticker: str,
+        user_id: int,
+        fiscal_year_end_month: int,
+        anchor: int,
+        values: array,
+        created_at: int,
+        updated_at: int
+    ):
+        self.ticker = ticker
+        self.user_id = user_id
+        self.fiscal_year_end_month = fiscal_year_end_month
+        self.anchor = anchor
+        self.values = values
+        self.created_at = created_at
+        self.updated_at = updated_at
+        self.history: Optional[EstimateHistory] = None
+
+    def same_calendar(self, calendar: Optional[FiscalCalendar]) -> bool:
+        return (
+            calendar is not None
+            and calendar.fiscal_year_end_month == self.fiscal_year_end_month
+        )
+
+    def rebased(self, calendar: Optional[FiscalCalendar]) -> Tuple[array, int]:
+        # Values re-keyed to the calendar's quarter, and the anchor they are
+        # keyed by; as saved without a comparable calendar
+        if not self.same_calendar(calendar):
+            return self.values, self.anchor
+        return rebase_periods(self.values, self.anchor, calendar.anchor), calendar.anchor
+
+    def to_dict(self, calendar: Optional[FiscalCalendar] = None) -> Dict:
+        values, anchor = self.rebased(calendar)
+        return {
+            "ticker": self.ticker,
+            "userId": self.user_id,
+            "periods": _unpack_periods(values),
+            "fiscalPeriods": _unpack_fiscal_periods(values, anchor),
+            "createdAt": datetime.fromtimestamp(self.created_at),
+            "updatedAt": datetime.fromtimestamp(self.updated_at)
+        }
+
+    def revise(self, values: array, calendar: FiscalCalendar, now: int):
+        # Compare against the stored values as they read under the new calendar
+        if not (
+            self.same_calendar(calendar)
+            and periods_equal(values, self.rebased(calendar)[0])
+        ):
+            if self.history is None:
+                # Unchanged since it was created, whatever later identical saves did
+                self.history = EstimateHistory(len(self.values))
+                self.history.append(self.created_at, self.anchor, self.values)
+            self.history.append(now, calendar.anchor, values, self.values)
+            if self.history.needs_compaction(now):
+                self.history.compact(now)
+            if self.user_id < 0 and len(self.history) > MAX_GUEST_HISTORY_VERSIONS:
+                self.history.truncate(MAX_GUEST_HISTORY_VERSIONS // 2)
+        self.fiscal_year_end_month = calendar.fiscal_year_end_month
+        self.anchor = calendar.anchor
+        self.values = values
+        self.updated_at = now
+
+# Ticker strings are interned and given a small id for building table keys.
+# Ids are never reused, so they must stay below 2**TICKER_ID_BITS for keys
+# to remain unique; tickers are also checked against a symbol pattern so
+# arbitrary strings cannot use up the id space.
+_ticker_ids: Dict[str, int] = {}
+TICKER_ID_BITS = 24
+_TICKER_PATTERN = re.compile(r"^[A-Za-z0-9.\-=^]{1,16}$")
+
+def is_valid_ticker(ticker: str) -> bool:
+    return _TICKER_PATTERN.match(ticker) is not None
+
+def _intern_ticker(ticker: str) -> Tuple[str, int]:
+    ticker_id = _ticker_ids.get(ticker)
+    if ticker_id is None:
+        if not is_valid_ticker(ticker):
+            raise ValueError(f"Invalid ticker: {ticker}")
+        if len(_ticker_ids) >= 1 << TICKER_ID_BITS:
+            raise ValueError("Too many distinct tickers")
+        ticker = sys.intern(ticker)
+        ticker_id = _ticker_ids[ticker] = len(_ticker_ids)
+    return ticker, ticker_id
+
+def _estimate_key(ticker_id: int, user_id: int) -> int:
+    # Guest user ids are negative; the shift keeps keys unique either way
+    return (user_id << TICKER_ID_BITS) | ticker_id
+
+def pack_periods(kind: str, periods: Dict[str, float]) -> array:
+    count = ESTIMATE_PERIOD_COUNTS[kind]
+    values = array("d", [_MISSING]) * count
+    for key, value in periods.items():
+        index = PERIOD_INDEX.get(key)
+        if index is None or index >= count:
+            raise ValueError(f"Unknown {kind} estimate period: {key}")
+        values[index] = value
+    return values
+
+def _get_estimate_table(kind: str) -> Dict[int, EstimateRecord]:
+    return {
+        "earnings": earnings_estimates_db,
+        "revenue": revenue_estimates_db,
+        "growth": growth_estimates_db
+    }[kind]
+
+def _save_estimate(
+    kind: str, ticker: str, user_id: int, periods: Dict[str, float], calendar: FiscalCalendar
+) -> Dict:
+    # Don't write on behalf of a caller that has already given up
+    check_deadline()
+    values = pack_periods(kind, periods)
+    now = int(time.time())
+    table = _get_estimate_table(kind)
+    with _estimates_lock:
+        ticker, ticker_id = _intern_ticker(ticker)
+        key = _estimate_key(ticker_id, user_id)
+        record = table.get(key)
+        if record is None:
+            record = table[key] = EstimateRecord(
+                ticker, user_id, calendar.fiscal_year_end_month, calendar.anchor, values, now, now
+            )
+        else:
+            record.revise(values, calendar, now)
+        return record.to_dict()
+
+def _get_record(kind: str, ticker: str, user_id: int) -> Optional[EstimateRecord]:
+    ticker_id = _ticker_ids.get(ticker)
+    if ticker_id is None:
+        return None
+    return _get_estimate_table(kind).get(_estimate_key(ticker_id, user_id))
+
+def _get_estimate(
+    kind: str, ticker: str, user_id: int, calendar: Optional[FiscalCalendar]
+) -> Optional[Dict]:
+    check_deadline()
+    with _estimates_lock:
+        record = _get_record(kind, ticker, user_id)
+        return record.to_dict(calendar) if record is not None else None
+
+# Estimate management functions
+# calendar is the ticker's current fiscal calendar (fiscal_calendar.get_fiscal_calendar);
+# reads given None return values as saved, against their stored anchor
+def save_earnings_estimate(
+    ticker: str, user_id: int, periods: Dict[str, float], calendar: FiscalCalendar
+):
+    return _save_estimate("earnings", ticker, user_id, periods, calendar)
+
+def get_earnings_estimate(ticker: str, user_id: int, calendar: Optional[FiscalCalendar]):
+    return _get_estimate("earnings", ticker, user_id, calendar)
+
+def save_revenue_estimate(
+    ticker: str, user_id: int, periods: Dict[str, float], calendar: FiscalCalendar
+):
+    return _save_estimate("revenue", ticker, user_id, periods, calendar)
+
+def get_revenue_estimate(ticker: str, user_id: int, calendar: Optional[FiscalCalendar]):
+    return _get_estimate("revenue", ticker, user_id, calendar)
+
+def save_growth_estimate(
+    ticker: str, user_id: int, periods: Dict[str, float], calendar: FiscalCalendar
+):
+    return _save_estimate("growth", ticker, user_id, periods, calendar)
+
+def get_growth_estimate(ticker: str, user_id: int, calendar: Optional[FiscalCalendar]):
+    return _get_estimate("growth", ticker, user_id, calendar)
+
+def get_estimate_period_value(
+    kind: str, ticker: str, user_id: int, period: str,
+    calendar: Optional[FiscalCalendar] = None
+) -> float:
+    # Single period read without building the API dict; NaN if not set
+    index = PERIOD_INDEX[period]
+    with _estimates_lock:
+        record = _get_record(kind, ticker, user_id)
+        if record is None or index >= len(record.values):
+            return _MISSING
+        if not record.same_calendar(calendar) or calendar.anchor == record.anchor:
+            return record.values[index]
+        return record.rebased(calendar)[0][index]
+
+# Estimate history queries
+def get_estimate_as_of(kind: str, ticker: str, user_id: int, as_of: datetime) -> Optional[Dict]:
+    check_deadline()
+    with _estimates_lock:
+        record = _get_record(kind, ticker, user_id)
+        if record is None:
+            return None
+
+        timestamp = int(as_of.timestamp())
+        if record.history is None:
+            if timestamp < record.created_at:
+                return None
+            return record.to_dict()
+
+        index = record.history.index_as_of(timestamp)
+        if index < 0:
+            return None
+        # Periods as they were keyed at that time, with their absolute fiscal periods
+        values = record.history.version(index)
+        return {
+            "ticker": record.ticker,
+            "userId": record.user_id,
+            "periods": _unpack_periods(values),
+            "fiscalPeriods": _unpack_fiscal_periods(values, record.history.anchors[index]),
+            "createdAt": datetime.fromtimestamp(record.created_at),
+            "updatedAt": datetime.fromtimestamp(record.history.timestamps[index])
+        }
+
+def get_estimate_timeline(
+    kind: str,
+    ticker: str,
+    user_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+) -> List[Dict]:
+    check_deadline()
+    with _estimates_lock:
+        record = _get_record(kind, ticker, user_id)
+        if record is None:
+            return []
+
+        history = record.history
+        if history is None:
+            # A single version: the estimate as first saved
+            history = EstimateHistory(len(record.values))
+            history.append(record.created_at, record.anchor, record.values)
+
+        timeline = []
+        for timestamp, anchor, changed, values in history.iter_versions(
+            int(start.timestamp()) if start is not None else None,
+            int(end.timestamp()) if end is not None else None
+        ):
+            timeline.append({
+                "timestamp": datetime.fromtimestamp(timestamp),
+                "periods": _unpack_periods(values),
+                "fiscalPeriods": _unpack_fiscal_periods(values, anchor),
+                "changed": [PERIOD_KEYS[i] for i in range(len(values)) if changed & (1 << i)]
+            })
+        return timeline
+
+def delete_estimate(kind: str, ticker: str, user_id: int):
+    with _estimates_lock:
+        ticker_id = _ticker_ids.get(ticker)
+        if ticker_id is None:
+            return None
+        return _get_estimate_table(kind).pop(_estimate_key(ticker_id, user_id), None)
+
+def transfer_estimate(kind: str, ticker: str, from_user_id: int, to_user_id: int):
+    # Move an estimate to another owner, e.g. a guest session into a new account
+    with _estimates_lock:
+        ticker_id = _ticker_ids.get(ticker)
+        if ticker_id is None:
+            return None
+        table = _get_estimate_table(kind)
+        record = table.pop(_estimate_key(ticker_id, from_user_id), None)
+        if record is None:
+            return None
+        record.user_id = to_user_id
+        record.updated_at = int(time.time())
+        table[_estimate_key(ticker_id, to_user_id)] = record
+        return record
 
 # Audit logging
 def log_action(user_id: int, action: str, details: Dict):
     # Implementation for audit logging
     print(f"AUDIT: User {user_id} performed {action} with details: {details}")
 
-# When we need SQL database, uncomment this code
+# When we need SQL database, uncomment this code. SQLAlchemy is imported
+# only here so the in-memory setup does not pay for it at startup.
 """
+from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, JSON, ForeignKey
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker, relationship
+
 # Database setup
 DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./finance.db")
 
@@ -0,0 +1,161 @@
+import asyncio
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+
+from api.profiling import run_profiled
+
+# Per-request deadlines. A middleware stores an absolute deadline in a context
+# variable; upstream fetches and database calls read it to bound their own
+# timeouts and to stop early once the caller is no longer waiting.
+# asyncio.to_thread copies the context, so worker threads see it too.
+REQUEST_TIMEOUT_HEADER = b"x-request-timeout"
+MAX_REQUEST_TIMEOUT_SECONDS = 30.0
+
+# Default budget per route group (see rate_limit.get_route_group)
+REQUEST_TIMEOUTS = {
+    "auth": 5.0,
+    "search": 2.0,
+    "stock": 5.0,
+    "estimates": 2.0,
+    "metrics": 10.0,
+    "default": 10.0,
+}
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar(
+    "request_deadline", default=None
+)
+
+class DeadlineExceeded(HTTPException):
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="Request deadline exceeded"
+        )
+
+def get_deadline() -> Optional[float]:
+    return _deadline.get()
+
+def remaining_seconds() -> Optional[float]:
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+def deadline_expired() -> bool:
+    deadline = _deadline.get()
+    return deadline is not None and time.monotonic() >= deadline
+
+def check_deadline():
+    if deadline_expired():
+        raise DeadlineExceeded()
+
+def bounded_timeout(timeout: float) -> float:
+    """
+    timeout capped to the time left before the deadline; raises if none is left
+    """
+    remaining = remaining_seconds()
+    if remaining is None:
+        return timeout
+    if remaining <= 0:
+        raise DeadlineExceeded()
+    return min(timeout, remaining)
+
+@contextmanager
+def no_deadline():
+    # For background work that outlives the request that triggered it
+    token = _deadline.set(None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+def _parse_timeout(scope) -> Optional[float]:
+    for key, value in scope["headers"]:
+        if key == REQUEST_TIMEOUT_HEADER:
+            try:
+                timeout = float(value)
+            except ValueError:
+                return None
+            return timeout if timeout > 0 else None
+    return None
+
+class DeadlineMiddleware:
+    """
+    ASGI middleware setting each request's deadline from its route group or
+    the X-Request-Timeout header (seconds), whichever is shorter
+    """
+
+    def __init__(
+        self,
+        app,
+        route_group: Callable[[str], Optional[str]],
+        timeouts: Dict[str, float] = REQUEST_TIMEOUTS
+    ):
+        self.app = app
+        self.route_group = route_group
+        self.timeouts = timeouts
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        group = self.route_group(scope["path"])
+        timeout = self.timeouts.get(group) if group is not None else None
+        requested = _parse_timeout(scope)
+        if requested is not None:
+            timeout = min(requested, timeout or MAX_REQUEST_TIMEOUT_SECONDS)
+        if timeout is None:
+            await self.app(scope, receive, send)
+            return
+
+        token = _deadline.set(time.monotonic() + timeout)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _deadline.reset(token)
+
+# Partial results for aggregate responses
+MAX_STALE_SECTIONS = 10000
+_last_good_sections: Dict[Tuple[str, str], Any] = {}
+
+async def gather_sections(
+    key: str, loaders: Dict[str, Callable[[], Any]]
+) -> Tuple[Dict[str, Any], List[str], List[str]]:
+    """
+    Run independent blocking loaders in threads until the request deadline.
+
+    Returns (results, missing, stale). A section that failed or did not
+    finish in time falls back to its last good value, flagged as stale, or
+    is left out and flagged as missing. Unfinished loaders are cancelled;
+    their blocking calls are already bounded by the same deadline.
+    """
+    tasks = {
+        name: asyncio.ensure_future(asyncio.to_thread(run_profiled, loader))
+        for name, loader in loaders.items()
+    }
+    remaining = remaining_seconds()
+    await asyncio.wait(
+        tasks.values(), timeout=max(remaining, 0) if remaining is not None else None
+    )
+
+    results: Dict[str, Any] = {}
+    missing: List[str] = []
+    stale: List[str] = []
+    for name, task in tasks.items():
+        if task.done() and not task.cancelled() and task.exception() is None:
+            results[name] = task.result()
+            if len(_last_good_sections) >= MAX_STALE_SECTIONS:
+                _last_good_sections.clear()
+            _last_good_sections[(key, name)] = results[name]
+            continue
+
+        task.cancel()
+        if (key, name) in _last_good_sections:
+            results[name] = _last_good_sections[(key, name)]
+            stale.append(name)
+        else:
+            missing.append(name)
+    return results, missing, stale
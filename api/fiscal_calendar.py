@@ -0,0 +1,175 @@
+import calendar
+from array import array
+from datetime import date
+from functools import lru_cache
+from typing import Dict, NamedTuple, Optional, Tuple
+
+# Fiscal periods for estimate labels and storage.
+#
+# Estimates are entered against relative periods ("nextQtr"), which mean a
+# different quarter once the current one ends. Every fiscal quarter gets an
+# absolute index, fiscal_year * 4 + (quarter - 1), called its anchor. Stored
+# estimates remember the anchor they were entered against and are rebased to
+# the current one when read, so a saved "nextQtr" keeps pointing at the same
+# quarter after a rollover.
+#
+# Fiscal years are named by the calendar year they end in, so with a
+# September year end, October 2026 falls in Q1 FY2027.
+
+# Relative periods in storage slot order
+RELATIVE_PERIODS = ("currentQtr", "nextQtr", "currentYear", "nextYear", "next5Years", "past5Years")
+
+_RELATIVE_NAMES = {
+    "currentQtr": "Current Quarter",
+    "nextQtr": "Next Quarter",
+    "currentYear": "Current Year",
+    "nextYear": "Next Year",
+    "next5Years": "Next 5 Years (per annum)",
+    "past5Years": "Past 5 Years (per annum)",
+}
+
+class FiscalPeriod(NamedTuple):
+    key: str  # absolute, e.g. "FY2027Q1", "FY2027" or "FY2028-FY2032"
+    label: str
+    start: date
+    end: date
+
+class FiscalCalendar(NamedTuple):
+    fiscal_year_end_month: int
+    anchor: int  # absolute index of the current fiscal quarter
+    periods: Dict[str, FiscalPeriod]  # relative period -> fiscal period
+    # relative period -> API metadata (label, fiscalPeriod, startDate, endDate),
+    # built once per calendar; callers copy it before adding values
+    metadata: Dict[str, Dict]
+
+def anchor_for(fiscal_year_end_month: int, as_of: date) -> int:
+    """
+    Absolute index of the fiscal quarter containing as_of
+    """
+    fiscal_year = as_of.year + (1 if as_of.month > fiscal_year_end_month else 0)
+    first_month = fiscal_year_end_month % 12 + 1
+    quarter = (as_of.month - first_month) % 12 // 3 + 1
+    return fiscal_year * 4 + quarter - 1
+
+def _month_start(month_index: int) -> date:
+    # month_index counts months from year 0
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+def _month_end(month_index: int) -> date:
+    year, month = month_index // 12, month_index % 12 + 1
+    return date(year, month, calendar.monthrange(year, month)[1])
+
+def _quarter_months(fiscal_year_end_month: int, anchor: int) -> Tuple[int, int]:
+    # First and last month index of a fiscal quarter
+    fiscal_year, quarter = divmod(anchor, 4)
+    last_month = fiscal_year * 12 + fiscal_year_end_month - 1 - (3 - quarter) * 3
+    return last_month - 2, last_month
+
+def quarter_key(anchor: int) -> str:
+    fiscal_year, quarter = divmod(anchor, 4)
+    return f"FY{fiscal_year}Q{quarter + 1}"
+
+def year_key(fiscal_year: int) -> str:
+    return f"FY{fiscal_year}"
+
+@lru_cache(maxsize=4096)
+def fiscal_period_keys(anchor: int) -> Tuple[str, ...]:
+    """
+    Absolute keys for each relative period, in RELATIVE_PERIODS order
+    """
+    fiscal_year = anchor // 4
+    return (
+        quarter_key(anchor),
+        quarter_key(anchor + 1),
+        year_key(fiscal_year),
+        year_key(fiscal_year + 1),
+        f"{year_key(fiscal_year + 1)}-{year_key(fiscal_year + 5)}",
+        f"{year_key(fiscal_year - 5)}-{year_key(fiscal_year - 1)}",
+    )
+
+def _build_calendar(fiscal_year_end_month: int, anchor: int) -> FiscalCalendar:
+    fiscal_year, quarter = divmod(anchor, 4)
+    keys = fiscal_period_keys(anchor)
+    # Calendar-year companies get plain "Q3 2026" labels
+    prefix = "" if fiscal_year_end_month == 12 else "FY"
+
+    def year_span(first: int, last: int) -> Tuple[date, date]:
+        start, _ = _quarter_months(fiscal_year_end_month, first * 4)
+        _, end = _quarter_months(fiscal_year_end_month, last * 4 + 3)
+        return _month_start(start), _month_end(end)
+
+    periods = {}
+    for offset, name in enumerate(("currentQtr", "nextQtr")):
+        start, end = _quarter_months(fiscal_year_end_month, anchor + offset)
+        year, number = divmod(anchor + offset, 4)
+        periods[name] = FiscalPeriod(
+            keys[offset], f"{_RELATIVE_NAMES[name]} (Q{number + 1} {prefix}{year})",
+            _month_start(start), _month_end(end)
+        )
+    for offset, name in enumerate(("currentYear", "nextYear")):
+        year = fiscal_year + offset
+        periods[name] = FiscalPeriod(
+            keys[2 + offset], f"{_RELATIVE_NAMES[name]} ({prefix}{year})", *year_span(year, year)
+        )
+    periods["next5Years"] = FiscalPeriod(
+        keys[4], _RELATIVE_NAMES["next5Years"], *year_span(fiscal_year + 1, fiscal_year + 5)
+    )
+    periods["past5Years"] = FiscalPeriod(
+        keys[5], _RELATIVE_NAMES["past5Years"], *year_span(fiscal_year - 5, fiscal_year - 1)
+    )
+
+    metadata = {
+        name: {
+            "label": period.label,
+            "fiscalPeriod": period.key,
+            "startDate": period.start,
+            "endDate": period.end
+        }
+        for name, period in periods.items()
+    }
+    return FiscalCalendar(fiscal_year_end_month, anchor, periods, metadata)
+
+@lru_cache(maxsize=1024)
+def _calendar_for_quarter(fiscal_year_end_month: int, anchor: int) -> FiscalCalendar:
+    return _build_calendar(fiscal_year_end_month, anchor)
+
+def get_fiscal_calendar(fiscal_year_end_month: int, as_of: Optional[date] = None) -> FiscalCalendar:
+    """
+    Fiscal calendar for a fiscal year ending in the given month, as of a date.
+
+    Memoized per (fiscal year end, quarter containing as_of): every day of a
+    quarter shares one calendar, and the first day of the next quarter gets
+    a new one.
+    """
+    if not 1 <= fiscal_year_end_month <= 12:
+        raise ValueError(f"Invalid fiscal year end month: {fiscal_year_end_month}")
+    as_of = date.today() if as_of is None else as_of
+    return _calendar_for_quarter(fiscal_year_end_month, anchor_for(fiscal_year_end_month, as_of))
+
+def rebase_slot(slot: int, from_anchor: int, to_anchor: int) -> Optional[int]:
+    """
+    Slot holding the same absolute period under another anchor, or None if
+    that period is no longer one of the relative periods (e.g. it has ended)
+    """
+    if slot < 2:
+        shifted = from_anchor + slot - to_anchor
+        return shifted if 0 <= shifted < 2 else None
+    if slot < 4:
+        shifted = from_anchor // 4 + slot - 2 - to_anchor // 4
+        return 2 + shifted if 0 <= shifted < 2 else None
+    # Five-year spans are relative to the current fiscal year
+    return slot if from_anchor // 4 == to_anchor // 4 else None
+
+def rebase_periods(values: array, from_anchor: int, to_anchor: int) -> array:
+    """
+    Period values entered against from_anchor, re-keyed to to_anchor; NaN for
+    periods that have no slot under the new anchor
+    """
+    if from_anchor == to_anchor:
+        return values
+    rebased = array("d", [float("nan")]) * len(values)
+    for slot, value in enumerate(values):
+        target = rebase_slot(slot, from_anchor, to_anchor)
+        if target is not None and target < len(values):
+            rebased[target] = value
+    return rebased
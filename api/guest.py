@@ -0,0 +1,161 @@
+import base64
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Set, Tuple
+
+from api.auth import SECRET_KEY
+from api.database import delete_estimate, transfer_estimate
+
+# Guest sessions: an opaque signed cookie points at a server-side session whose
+# estimates live in the regular estimate tables under a negative user id.
+GUEST_COOKIE_NAME = "guest_session"
+GUEST_SESSION_TTL_SECONDS = 24 * 60 * 60
+
+# Memory caps - guests are anonymous, so storage must stay strictly bounded
+MAX_ESTIMATES_PER_SESSION = 50
+MAX_PERIODS_PER_ESTIMATE = 6
+MAX_GUEST_SESSIONS = 10000
+MAX_GUEST_ESTIMATES = 100000
+
+class GuestStorageFull(Exception):
+    pass
+
+class GuestSession:
+    __slots__ = ("session_id", "user_id", "estimates", "last_seen")
+
+    def __init__(self, session_id: str, user_id: int):
+        self.session_id = session_id
+        self.user_id = user_id
+        self.estimates: Set[Tuple[str, str]] = set()  # (kind, ticker)
+        self.last_seen = time.time()
+
+# Ordered oldest -> most recently used, so expiry and LRU eviction pop from the front
+guest_sessions_db: "OrderedDict[str, GuestSession]" = OrderedDict()
+guest_estimate_count = 0
+guest_id_counter = -1
+_lock = threading.Lock()
+
+def _sign(session_id: str) -> str:
+    digest = hmac.new(SECRET_KEY.encode(), session_id.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:18]).decode()
+
+def _unsign(cookie_value: Optional[str]) -> Optional[str]:
+    if not cookie_value or "." not in cookie_value:
+        return None
+    session_id, signature = cookie_value.rsplit(".", 1)
+    if not hmac.compare_digest(signature, _sign(session_id)):
+        return None
+    return session_id
+
+def _drop_session(session: GuestSession):
+    global guest_estimate_count
+    for kind, ticker in session.estimates:
+        delete_estimate(kind, ticker, session.user_id)
+    guest_estimate_count -= len(session.estimates)
+    session.estimates.clear()
+
+def _evict_expired(now: float):
+    cutoff = now - GUEST_SESSION_TTL_SECONDS
+    while guest_sessions_db:
+        session = next(iter(guest_sessions_db.values()))
+        if session.last_seen > cutoff:
+            break
+        guest_sessions_db.popitem(last=False)
+        _drop_session(session)
+
+def _evict_oldest(keep: Optional[GuestSession] = None) -> bool:
+    for session_id, session in guest_sessions_db.items():
+        if session is not keep:
+            del guest_sessions_db[session_id]
+            _drop_session(session)
+            return True
+    return False
+
+def get_guest_session(cookie_value: Optional[str]) -> Optional[GuestSession]:
+    session_id = _unsign(cookie_value)
+    if session_id is None:
+        return None
+
+    with _lock:
+        now = time.time()
+        _evict_expired(now)
+        session = guest_sessions_db.get(session_id)
+        if session is not None:
+            session.last_seen = now
+            guest_sessions_db.move_to_end(session_id)
+        return session
+
+def create_guest_session() -> Tuple[GuestSession, str]:
+    """
+    Start a new guest session, returning it with its signed cookie value
+    """
+    global guest_id_counter
+    with _lock:
+        _evict_expired(time.time())
+        while len(guest_sessions_db) >= MAX_GUEST_SESSIONS:
+            _evict_oldest()
+
+        session_id = secrets.token_urlsafe(24)
+        session = GuestSession(session_id, guest_id_counter)
+        guest_id_counter -= 1
+        guest_sessions_db[session_id] = session
+        return session, f"{session_id}.{_sign(session_id)}"
+
+def save_guest_estimate(
+    session: GuestSession,
+    kind: str,
+    ticker: str,
+    periods: Dict[str, float],
+    save: Callable[[int], Dict]
+) -> Dict:
+    """
+    Write a guest estimate with save(user_id), enforcing the memory caps.
+
+    The slot is counted and the estimate written under the same lock, so a
+    concurrent eviction cannot leave behind a record that no session tracks.
+    """
+    global guest_estimate_count
+    if len(periods) > MAX_PERIODS_PER_ESTIMATE:
+        raise GuestStorageFull("Too many periods in guest estimate")
+
+    with _lock:
+        if guest_sessions_db.get(session.session_id) is not session:
+            raise GuestStorageFull("Guest session has expired")
+        new_slot = (kind, ticker) not in session.estimates
+        if new_slot:
+            if len(session.estimates) >= MAX_ESTIMATES_PER_SESSION:
+                raise GuestStorageFull("Guest estimate limit reached, register to save more")
+            while guest_estimate_count >= MAX_GUEST_ESTIMATES:
+                if not _evict_oldest(keep=session):
+                    raise GuestStorageFull("Guest storage is full")
+
+        # A failed save leaves no slot behind
+        saved = save(session.user_id)
+        if new_slot:
+            session.estimates.add((kind, ticker))
+            guest_estimate_count += 1
+        return saved
+
+def merge_guest_session(cookie_value: Optional[str], user_id: int) -> int:
+    """
+    Move a guest session's estimates into a user account and end the session
+    """
+    global guest_estimate_count
+    session_id = _unsign(cookie_value)
+    if session_id is None:
+        return 0
+
+    with _lock:
+        session = guest_sessions_db.pop(session_id, None)
+        if session is None:
+            return 0
+        for kind, ticker in session.estimates:
+            transfer_estimate(kind, ticker, session.user_id, user_id)
+        merged = len(session.estimates)
+        guest_estimate_count -= merged
+        session.estimates.clear()
+        return merged
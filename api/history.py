@@ -0,0 +1,191 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Iterator, List, Optional, Tuple
+
+from api.fiscal_calendar import rebase_periods
+
+# Append-only version log for one (user, ticker, kind) estimate.
+#
+# Each version stores only the periods that changed since the previous one: a
+# bit mask of changed period indices plus their new values, packed into flat
+# arrays. Every KEYFRAME_INTERVAL-th version is a full snapshot, so rebuilding
+# any version replays at most KEYFRAME_INTERVAL deltas. Lookups by time use
+# binary search over the sorted timestamp array.
+#
+# Each version also records the fiscal anchor its values were entered against
+# (see fiscal_calendar). A version whose anchor differs from the previous one
+# is stored in full, since its slots refer to different periods.
+KEYFRAME_INTERVAL = 16
+
+# Versions older than the retention window are compacted down to the last
+# version in each bucket
+HISTORY_RETENTION_SECONDS = 90 * 24 * 60 * 60
+COMPACTED_BUCKET_SECONDS = 24 * 60 * 60
+
+def _same(a: float, b: float) -> bool:
+    # NaN marks a missing period, so two NaNs count as equal
+    return a == b or (a != a and b != b)
+
+def periods_equal(a: array, b: array) -> bool:
+    return len(a) == len(b) and all(_same(x, y) for x, y in zip(a, b))
+
+class EstimateHistory:
+    __slots__ = (
+        "period_count", "timestamps", "anchors", "masks", "offsets", "values", "compacted_at"
+    )
+
+    def __init__(self, period_count: int):
+        self.period_count = period_count
+        self.timestamps = array("q")
+        self.anchors = array("i")
+        self.masks = array("B")
+        self.offsets = array("I")
+        self.values = array("d")
+        self.compacted_at = 0
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def append(
+        self, timestamp: int, anchor: int, current: array, previous: Optional[array] = None
+    ):
+        """
+        Record a new version; previous is the full version before it
+        """
+        if (
+            len(self.timestamps) % KEYFRAME_INTERVAL == 0
+            or previous is None
+            or self.anchors[-1] != anchor
+        ):
+            mask = (1 << self.period_count) - 1
+        else:
+            mask = 0
+            for i in range(self.period_count):
+                if not _same(current[i], previous[i]):
+                    mask |= 1 << i
+
+        self.timestamps.append(timestamp)
+        self.anchors.append(anchor)
+        self.masks.append(mask)
+        self.offsets.append(len(self.values))
+        for i in range(self.period_count):
+            if mask & (1 << i):
+                self.values.append(current[i])
+
+    def _apply(self, index: int, values: array):
+        mask = self.masks[index]
+        offset = self.offsets[index]
+        for i in range(self.period_count):
+            if mask & (1 << i):
+                values[i] = self.values[offset]
+                offset += 1
+
+    def version(self, index: int) -> array:
+        keyframe = index - index % KEYFRAME_INTERVAL
+        values = array("d", [float("nan")]) * self.period_count
+        for i in range(keyframe, index + 1):
+            self._apply(i, values)
+        return values
+
+    def index_as_of(self, timestamp: int) -> int:
+        # Latest version saved at or before timestamp, or -1
+        return bisect_right(self.timestamps, timestamp) - 1
+
+    def iter_versions(
+        self, start: Optional[int] = None, end: Optional[int] = None
+    ) -> Iterator[Tuple[int, int, int, array]]:
+        """
+        Yield (timestamp, anchor, changed mask, full values) for versions in [start, end]
+        """
+        first = bisect_left(self.timestamps, start) if start is not None else 0
+        last = bisect_right(self.timestamps, end) if end is not None else len(self.timestamps)
+        if first >= last:
+            return
+
+        values = self.version(first)
+        previous = self.version(first - 1) if first > 0 else None
+        for index in range(first, last):
+            if index > first:
+                self._apply(index, values)
+            anchor = self.anchors[index]
+            if previous is not None and index > 0 and self.anchors[index - 1] != anchor:
+                # Compare the same fiscal periods across a rollover
+                previous = rebase_periods(previous, self.anchors[index - 1], anchor)
+            changed = self._changed_mask(values, previous)
+            yield self.timestamps[index], anchor, changed, array("d", values)
+            previous = array("d", values)
+
+    def _changed_mask(self, values: array, previous: Optional[array]) -> int:
+        # Keyframes store every period, so compare against the prior version instead
+        mask = 0
+        for i in range(self.period_count):
+            if previous is None:
+                if values[i] == values[i]:
+                    mask |= 1 << i
+            elif not _same(values[i], previous[i]):
+                mask |= 1 << i
+        return mask
+
+    def compact(self, now: int):
+        """
+        Collapse versions older than the retention window to one per bucket
+        """
+        self.compacted_at = now
+        cutoff = now - HISTORY_RETENTION_SECONDS
+        if not self.timestamps or self.timestamps[0] >= cutoff:
+            return
+
+        versions: List[Tuple[int, int, array]] = []
+        values = array("d", [float("nan")]) * self.period_count
+        count = len(self.timestamps)
+        for index in range(count):
+            self._apply(index, values)
+            timestamp = self.timestamps[index]
+            if timestamp < cutoff and index + 1 < count:
+                next_timestamp = self.timestamps[index + 1]
+                same_bucket = (
+                    next_timestamp < cutoff
+                    and next_timestamp // COMPACTED_BUCKET_SECONDS == timestamp // COMPACTED_BUCKET_SECONDS
+                    and self.anchors[index + 1] == self.anchors[index]
+                )
+                if same_bucket:
+                    continue
+            versions.append((timestamp, self.anchors[index], array("d", values)))
+
+        if len(versions) == count:
+            return
+        self._rebuild(versions)
+
+    def truncate(self, keep: int):
+        """
+        Drop all but the newest keep versions
+        """
+        count = len(self.timestamps)
+        if count <= keep:
+            return
+        first = count - keep
+        versions: List[Tuple[int, int, array]] = []
+        values = self.version(first)
+        for index in range(first, count):
+            if index > first:
+                self._apply(index, values)
+            versions.append((self.timestamps[index], self.anchors[index], array("d", values)))
+        self._rebuild(versions)
+
+    def _rebuild(self, versions: List[Tuple[int, int, array]]):
+        self.timestamps = array("q")
+        self.anchors = array("i")
+        self.masks = array("B")
+        self.offsets = array("I")
+        self.values = array("d")
+        previous = None
+        for timestamp, anchor, version in versions:
+            self.append(timestamp, anchor, version, previous)
+            previous = version
+
+    def needs_compaction(self, now: int) -> bool:
+        return (
+            now - self.compacted_at >= COMPACTED_BUCKET_SECONDS
+            and bool(self.timestamps)
+            and self.timestamps[0] < now - HISTORY_RETENTION_SECONDS
+        )
@@ -1,47 +1,68 @@
-from fastapi import FastAPI, Depends, HTTPException, status, Request, Form
+from fastapi import FastAPI, Depends, HTTPException, status, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordRequestForm
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, Response
-from typing import List, Dict, Optional
-import uvicorn
-import os
-import mimetypes
+from fastapi.responses import PlainTextResponse, Response
+from typing import Callable, List, Dict, Optional, Union
 from datetime import datetime, timedelta
-import pathlib
 
-# Register additional MIME types
-mimetypes.add_type("application/javascript", ".js")
-mimetypes.add_type("application/javascript", ".jsx")
-mimetypes.add_type("application/javascript", ".ts")
-mimetypes.add_type("application/javascript", ".tsx")
-mimetypes.add_type("text/css", ".css")
-mimetypes.add_type("text/html", ".html")
+# Keep module-level imports to what the request path needs: this process is
+# started on demand by the autoscaler, so import time is paid by the first
+# request. Heavy or rarely used dependencies are imported where they are used.
 
 from api.models import (
     Token, User, UserCreate, 
     StockData, AnalystData, SearchResult,
     YahooFinanceEarningsData, YahooFinanceRevenueData, YahooFinanceGrowthData,
-    EarningsEstimate, RevenueEstimate, GrowthEstimate
+    EarningsEstimate, RevenueEstimate, GrowthEstimate,
+    EstimateKind, EstimateRevision, ValuationMetrics,
+    ScreenerResponse, StockOverview,
+    ProfilerStatus, SlowRequestLog
 )
 from api.auth import (
-    get_current_user, authenticate_user, 
+    get_current_user, get_optional_user, get_admin_user, authenticate_user, 
     create_access_token, get_password_hash
 )
 from api.database import (
     get_user_by_username, create_user, 
     save_earnings_estimate, get_earnings_estimate,
     save_revenue_estimate, get_revenue_estimate,
-    save_growth_estimate, get_growth_estimate
+    save_growth_estimate, get_growth_estimate,
+    get_estimate_as_of, get_estimate_timeline,
+    pack_periods, is_valid_ticker, log_action
+)
+from api.deadline import DeadlineMiddleware, REQUEST_TIMEOUTS, gather_sections
+from api.guest import (
+    GUEST_COOKIE_NAME, GUEST_SESSION_TTL_SECONDS, GuestStorageFull,
+    get_guest_session, create_guest_session,
+    save_guest_estimate, merge_guest_session
+)
+from api.metrics import MAX_METRICS_TICKERS, get_valuation_metrics
+from api.profiling import (
+    MAX_PROFILE_DURATION_SECONDS, ProfiledRoute, ProfilingMiddleware,
+    get_profiler, start_profiler, stop_profiler, span,
+    get_slow_request_threshold_ms, set_slow_request_threshold_ms, get_slow_requests
+)
+from api.screener import MAX_SCREEN_LIMIT, parse_filter, parse_sort, screen
+from api.rate_limit import (
+    RATE_LIMIT_ENABLED, RATE_LIMITS,
+    RateLimitMiddleware, get_rate_limit_backend, get_route_group
 )
 from api.yahoo_finance import (
     get_stock_data, get_analyst_data, 
     get_earnings_estimates, get_revenue_estimates,
-    get_growth_estimates, search_stocks
+    get_growth_estimates, search_stocks, get_estimate_calendar
 )
 
 # Create FastAPI app - API only
 app = FastAPI(title="Yahoo Finance Clone API", version="1.0.0")
+# Routes record stage timings when slow request capture is on
+app.router.route_class = ProfiledRoute
+
+# Rate limiting; added before CORS so that 429 responses still carry CORS headers
+if RATE_LIMIT_ENABLED:
+    app.add_middleware(
+        RateLimitMiddleware, limits=RATE_LIMITS, backend=get_rate_limit_backend()
+    )
 
 # Add CORS middleware
 app.add_middleware(
@@ -52,10 +73,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request deadlines, outermost so the budget covers the whole request.
+# Clients may ask for a shorter one with an X-Request-Timeout header.
+app.add_middleware(
+    DeadlineMiddleware, route_group=get_route_group, timeouts=REQUEST_TIMEOUTS
+)
+
+# Admin-controlled profiling; a pass-through unless switched on
+app.add_middleware(ProfilingMiddleware)
+
 # Authentication endpoints
 @app.post("/api/token", response_model=Token)
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
-    user = authenticate_user(form_data.username, form_data.password)
+    with span("auth"):
+        user = authenticate_user(form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -71,7 +102,7 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.post("/api/register", response_model=User)
-async def register_user(user: UserCreate):
+async def register_user(user: UserCreate, request: Request, response: Response):
     db_user = get_user_by_username(user.username)
     if db_user:
         raise HTTPException(
@@ -82,6 +113,14 @@ async def register_user(user: UserCreate):
     hashed_password = get_password_hash(user.password)
     created_user = create_user(user.username, user.email, hashed_password)
     
+    # Carry over anything saved while browsing as a guest
+    guest_cookie = request.cookies.get(GUEST_COOKIE_NAME)
+    if guest_cookie:
+        merged = merge_guest_session(guest_cookie, created_user["id"])
+        response.delete_cookie(GUEST_COOKIE_NAME)
+        if merged:
+            log_action(created_user["id"], "merge_guest_estimates", {"count": merged})
+    
     return created_user
 
 @app.get("/api/user", response_model=User)
@@ -94,17 +133,45 @@ async def logout():
     return {"message": "Logged out successfully"}
 
 # Stock data endpoints
+# Handlers that call upstream (directly or through the fiscal calendar) are
+# plain functions, so FastAPI runs them in its threadpool and a slow upstream
+# call blocks only its own request, not the event loop.
+def _to_stock_data(stock_data: Dict) -> Dict:
+    return {
+        "symbol": stock_data["symbol"],
+        "name": stock_data["shortName"],
+        "price": stock_data["regularMarketPrice"],
+        "change": stock_data["regularMarketChange"],
+        "changePercent": stock_data["regularMarketChangePercent"]
+    }
+
+def _to_analyst_data(analyst_data: Dict) -> Dict:
+    return {
+        "recommendationMean": analyst_data["recommendationMean"],
+        "recommendationTrends": {
+            "strongBuy": analyst_data["recommendationTrends"]["strongBuy"],
+            "buy": analyst_data["recommendationTrends"]["buy"],
+            "hold": analyst_data["recommendationTrends"]["hold"],
+            "underperform": analyst_data["recommendationTrends"]["sell"],
+            "sell": analyst_data["recommendationTrends"]["strongSell"] 
+                if "strongSell" in analyst_data["recommendationTrends"] 
+                else 0
+        },
+        "targetLow": analyst_data["targetLowPrice"],
+        "targetMean": analyst_data["targetMeanPrice"],
+        "targetHigh": analyst_data["targetHighPrice"],
+        "targetMedian": analyst_data["targetMedianPrice"],
+        "currentPrice": analyst_data["currentPrice"] 
+            if "currentPrice" in analyst_data 
+            else 0
+    }
+
 @app.get("/api/stock/{ticker}", response_model=StockData)
-async def get_stock_info(ticker: str):
+def get_stock_info(ticker: str):
     try:
-        stock_data = get_stock_data(ticker)
-        return {
-            "symbol": stock_data["symbol"],
-            "name": stock_data["shortName"],
-            "price": stock_data["regularMarketPrice"],
-            "change": stock_data["regularMarketChange"],
-            "changePercent": stock_data["regularMarketChangePercent"]
-        }
+        return _to_stock_data(get_stock_data(ticker))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -112,28 +179,11 @@ async def get_stock_info(ticker: str):
         )
 
 @app.get("/api/stock/{ticker}/analyst", response_model=AnalystData)
-async def get_analyst_info(ticker: str):
+def get_analyst_info(ticker: str):
     try:
-        analyst_data = get_analyst_data(ticker)
-        return {
-            "recommendationMean": analyst_data["recommendationMean"],
-            "recommendationTrends": {
-                "strongBuy": analyst_data["recommendationTrends"]["strongBuy"],
-                "buy": analyst_data["recommendationTrends"]["buy"],
-                "hold": analyst_data["recommendationTrends"]["hold"],
-                "underperform": analyst_data["recommendationTrends"]["sell"],
-                "sell": analyst_data["recommendationTrends"]["strongSell"] 
-                    if "strongSell" in analyst_data["recommendationTrends"] 
-                    else 0
-            },
-            "targetLow": analyst_data["targetLowPrice"],
-            "targetMean": analyst_data["targetMeanPrice"],
-            "targetHigh": analyst_data["targetHighPrice"],
-            "targetMedian": analyst_data["targetMedianPrice"],
-            "currentPrice": analyst_data["currentPrice"] 
-                if "currentPrice" in analyst_data 
-                else 0
-        }
+        return _to_analyst_data(get_analyst_data(ticker))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -141,9 +191,11 @@ async def get_analyst_info(ticker: str):
         )
 
 @app.get("/api/stock/{ticker}/earnings", response_model=YahooFinanceEarningsData)
-async def get_earnings_info(ticker: str):
+def get_earnings_info(ticker: str):
     try:
         return get_earnings_estimates(ticker)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -151,9 +203,11 @@ async def get_earnings_info(ticker: str):
         )
 
 @app.get("/api/stock/{ticker}/revenue", response_model=YahooFinanceRevenueData)
-async def get_revenue_info(ticker: str):
+def get_revenue_info(ticker: str):
     try:
         return get_revenue_estimates(ticker)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -161,17 +215,32 @@ async def get_revenue_info(ticker: str):
         )
         
 @app.get("/api/stock/{ticker}/growth", response_model=YahooFinanceGrowthData)
-async def get_growth_info(ticker: str):
+def get_growth_info(ticker: str):
     try:
         return get_growth_estimates(ticker)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to fetch growth data: {str(e)}"
         )
 
+# Everything the ticker page shows, fetched concurrently. A slow or failing
+# section is flagged instead of failing the whole response.
+@app.get("/api/stock/{ticker}/overview", response_model=StockOverview)
+async def get_stock_overview(ticker: str):
+    sections, missing, stale = await gather_sections(ticker, {
+        "stock": lambda: _to_stock_data(get_stock_data(ticker)),
+        "analyst": lambda: _to_analyst_data(get_analyst_data(ticker)),
+        "earnings": lambda: get_earnings_estimates(ticker),
+        "revenue": lambda: get_revenue_estimates(ticker),
+        "growth": lambda: get_growth_estimates(ticker)
+    })
+    return {"symbol": ticker, **sections, "missing": missing, "stale": stale}
+
 @app.get("/api/search", response_model=List[SearchResult])
-async def search_for_stocks(query: str):
+def search_for_stocks(query: str):
     if not query:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -189,6 +258,8 @@ async def search_for_stocks(query: str):
                 typeDisp=result["typeDisp"]
             ) for result in results
         ]
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -196,25 +267,86 @@ async def search_for_stocks(query: str):
         )
 
 # Custom estimates endpoints
-@app.post("/api/estimates/{ticker}/earnings", response_model=EarningsEstimate)
-async def save_earnings_estimate(
-    estimate: EarningsEstimate,
-    current_user: User = Depends(get_current_user)
-):
-    try:
+# Logged-in users own estimates by account id; guests are identified by a
+# signed session cookie pointing into the server-side guest store.
+def _save_owned_estimate(
+    kind: str,
+    estimate,
+    request: Request,
+    response: Response,
+    current_user: Optional[User],
+    save: Callable[[int], Dict]
+) -> Dict:
+    # save(owner_id) writes the estimate for the resolved owner. Periods are
+    # validated first so a rejected save never takes a guest slot.
+    pack_periods(kind, estimate.periods)
+    if current_user is not None:
         # Ensure the user can only save their own estimates
         if estimate.userId != current_user["id"]:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Cannot save estimates for another user"
             )
-        
-        saved_estimate = save_earnings_estimate(
-            estimate.ticker, estimate.userId, estimate.periods
+        return save(current_user["id"])
+
+    session = get_guest_session(request.cookies.get(GUEST_COOKIE_NAME))
+    if session is None:
+        session, cookie_value = create_guest_session()
+        response.set_cookie(
+            GUEST_COOKIE_NAME,
+            cookie_value,
+            max_age=GUEST_SESSION_TTL_SECONDS,
+            httponly=True,
+            secure=True,
+            samesite="lax"
+        )
+    try:
+        return save_guest_estimate(session, kind, estimate.ticker, estimate.periods, save)
+    except GuestStorageFull as e:
+        raise HTTPException(
+            status_code=status.HTTP_507_INSUFFICIENT_STORAGE,
+            detail=str(e)
+        )
+
+def _get_reading_owner_id(request: Request, current_user: Optional[User]) -> Optional[int]:
+    if current_user is not None:
+        return current_user["id"]
+    session = get_guest_session(request.cookies.get(GUEST_COOKIE_NAME))
+    return session.user_id if session is not None else None
+
+def _require_estimate_calendar(ticker: str):
+    calendar = get_estimate_calendar(ticker)
+    if calendar is None:
+        # Saving against a guessed calendar would mislabel the periods later
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Fiscal calendar for {ticker} is unavailable; try again later"
+        )
+    return calendar
+
+@app.post("/api/estimates/{ticker}/earnings", response_model=EarningsEstimate)
+def save_user_earnings_estimate(
+    estimate: EarningsEstimate,
+    request: Request,
+    response: Response,
+    current_user: Optional[User] = Depends(get_optional_user)
+):
+    try:
+        # Periods are stored against the ticker's current fiscal calendar
+        calendar = _require_estimate_calendar(estimate.ticker)
+        return _save_owned_estimate(
+            "earnings", estimate, request, response, current_user,
+            lambda owner_id: save_earnings_estimate(
+                estimate.ticker, owner_id, estimate.periods, calendar
+            )
         )
-        return saved_estimate
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -222,24 +354,28 @@ async def save_earnings_estimate(
         )
 
 @app.post("/api/estimates/{ticker}/revenue", response_model=RevenueEstimate)
-async def save_revenue_estimate(
+def save_user_revenue_estimate(
     estimate: RevenueEstimate,
-    current_user: User = Depends(get_current_user)
+    request: Request,
+    response: Response,
+    current_user: Optional[User] = Depends(get_optional_user)
 ):
     try:
-        # Ensure the user can only save their own estimates
-        if estimate.userId != current_user["id"]:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Cannot save estimates for another user"
+        # Periods are stored against the ticker's current fiscal calendar
+        calendar = _require_estimate_calendar(estimate.ticker)
+        return _save_owned_estimate(
+            "revenue", estimate, request, response, current_user,
+            lambda owner_id: save_revenue_estimate(
+                estimate.ticker, owner_id, estimate.periods, calendar
             )
-        
-        saved_estimate = save_revenue_estimate(
-            estimate.ticker, estimate.userId, estimate.periods
         )
-        return saved_estimate
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -247,24 +383,28 @@ async def save_revenue_estimate(
         )
 
 @app.post("/api/estimates/{ticker}/growth", response_model=GrowthEstimate)
-async def save_growth_estimate(
+def save_user_growth_estimate(
     estimate: GrowthEstimate,
-    current_user: User = Depends(get_current_user)
+    request: Request,
+    response: Response,
+    current_user: Optional[User] = Depends(get_optional_user)
 ):
     try:
-        # Ensure the user can only save their own estimates
-        if estimate.userId != current_user["id"]:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Cannot save estimates for another user"
+        # Periods are stored against the ticker's current fiscal calendar
+        calendar = _require_estimate_calendar(estimate.ticker)
+        return _save_owned_estimate(
+            "growth", estimate, request, response, current_user,
+            lambda owner_id: save_growth_estimate(
+                estimate.ticker, owner_id, estimate.periods, calendar
             )
-        
-        saved_estimate = save_growth_estimate(
-            estimate.ticker, estimate.userId, estimate.periods
         )
-        return saved_estimate
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -273,12 +413,17 @@ async def save_growth_estimate(
 
 # Get user's custom estimates
 @app.get("/api/estimates/{ticker}/earnings", response_model=EarningsEstimate)
-async def get_user_earnings_estimate(
+def get_user_earnings_estimate(
     ticker: str,
-    current_user: User = Depends(get_current_user)
+    request: Request,
+    current_user: Optional[User] = Depends(get_optional_user)
 ):
     try:
-        estimate = get_earnings_estimate(ticker, current_user["id"])
+        owner_id = _get_reading_owner_id(request, current_user)
+        estimate = (
+            get_earnings_estimate(ticker, owner_id, get_estimate_calendar(ticker))
+            if owner_id is not None else None
+        )
         if not estimate:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -294,12 +439,17 @@ async def get_user_earnings_estimate(
         )
 
 @app.get("/api/estimates/{ticker}/revenue", response_model=RevenueEstimate)
-async def get_user_revenue_estimate(
+def get_user_revenue_estimate(
     ticker: str,
-    current_user: User = Depends(get_current_user)
+    request: Request,
+    current_user: Optional[User] = Depends(get_optional_user)
 ):
     try:
-        estimate = get_revenue_estimate(ticker, current_user["id"])
+        owner_id = _get_reading_owner_id(request, current_user)
+        estimate = (
+            get_revenue_estimate(ticker, owner_id, get_estimate_calendar(ticker))
+            if owner_id is not None else None
+        )
         if not estimate:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -315,12 +465,17 @@ async def get_user_revenue_estimate(
         )
 
 @app.get("/api/estimates/{ticker}/growth", response_model=GrowthEstimate)
-async def get_user_growth_estimate(
+def get_user_growth_estimate(
     ticker: str,
-    current_user: User = Depends(get_current_user)
+    request: Request,
+    current_user: Optional[User] = Depends(get_optional_user)
 ):
     try:
-        estimate = get_growth_estimate(ticker, current_user["id"])
+        owner_id = _get_reading_owner_id(request, current_user)
+        estimate = (
+            get_growth_estimate(ticker, owner_id, get_estimate_calendar(ticker))
+            if owner_id is not None else None
+        )
         if not estimate:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -335,6 +490,191 @@ async def get_user_growth_estimate(
             detail=f"Failed to retrieve growth estimate: {str(e)}"
         )
 
+# Estimate revision history
+@app.get("/api/estimates/{ticker}/{kind}/history", response_model=List[EstimateRevision])
+async def get_user_estimate_timeline(
+    ticker: str,
+    kind: EstimateKind,
+    request: Request,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    current_user: Optional[User] = Depends(get_optional_user)
+):
+    try:
+        owner_id = _get_reading_owner_id(request, current_user)
+        if owner_id is None:
+            return []
+        return get_estimate_timeline(kind.value, ticker, owner_id, start, end)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to retrieve {kind.value} estimate history: {str(e)}"
+        )
+
+@app.get(
+    "/api/estimates/{ticker}/{kind}/as-of",
+    response_model=Union[EarningsEstimate, RevenueEstimate, GrowthEstimate]
+)
+async def get_user_estimate_as_of(
+    ticker: str,
+    kind: EstimateKind,
+    at: datetime,
+    request: Request,
+    current_user: Optional[User] = Depends(get_optional_user)
+):
+    try:
+        owner_id = _get_reading_owner_id(request, current_user)
+        estimate = get_estimate_as_of(kind.value, ticker, owner_id, at) if owner_id is not None else None
+        if not estimate:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"No {kind.value} estimate found for this ticker at that time"
+            )
+        return estimate
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to retrieve {kind.value} estimate: {str(e)}"
+        )
+
+# Derived valuation metrics for a batch of tickers
+@app.get("/api/metrics", response_model=List[ValuationMetrics])
+def get_metrics(
+    tickers: str,
+    request: Request,
+    current_user: Optional[User] = Depends(get_optional_user)
+):
+    symbols = list(dict.fromkeys(t.strip() for t in tickers.split(",") if t.strip()))
+    if not symbols:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="At least one ticker is required"
+        )
+    if len(symbols) > MAX_METRICS_TICKERS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_METRICS_TICKERS} tickers per request"
+        )
+    invalid = [symbol for symbol in symbols if not is_valid_ticker(symbol)]
+    if invalid:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid ticker: {invalid[0]}"
+        )
+
+    try:
+        owner_id = _get_reading_owner_id(request, current_user)
+        return get_valuation_metrics(symbols, owner_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to compute metrics: {str(e)}"
+        )
+
+# Screener over the periodically rebuilt universe snapshot
+@app.get("/api/screen", response_model=ScreenerResponse)
+def screen_stocks(
+    filters: List[str] = Query(default=[], alias="filter"),
+    sort: Optional[str] = None,
+    limit: int = Query(default=50, ge=1, le=MAX_SCREEN_LIMIT),
+    offset: int = Query(default=0, ge=0)
+):
+    # e.g. /api/screen?filter=marketCap>=1e10&filter=trailingPE<30&sort=-changePercent
+    try:
+        parsed_filters = [parse_filter(expression) for expression in filters]
+        sort_key = parse_sort(sort) if sort else None
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    try:
+        return screen(parsed_filters, sort_key, limit, offset)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to screen stocks: {str(e)}"
+        )
+
+# Admin profiling endpoints
+@app.post("/api/admin/profiler/start", response_model=ProfilerStatus)
+async def start_profiling(
+    duration: float = Query(default=30, gt=0, le=MAX_PROFILE_DURATION_SECONDS),
+    fraction: float = Query(default=1.0, gt=0, le=1),
+    interval_ms: float = Query(default=5, ge=1, le=1000),
+    admin_user: User = Depends(get_admin_user)
+):
+    try:
+        profiler = start_profiler(duration, fraction, interval_ms / 1000)
+    except RuntimeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+    log_action(admin_user["id"], "start_profiler", {"duration": duration, "fraction": fraction})
+    return profiler.status()
+
+@app.post("/api/admin/profiler/stop", response_model=ProfilerStatus)
+def stop_profiling(admin_user: User = Depends(get_admin_user)):
+    profiler = stop_profiler()
+    if profiler is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No profiling session"
+        )
+    return profiler.status()
+
+@app.get("/api/admin/profiler", response_model=ProfilerStatus)
+async def get_profiling_status(admin_user: User = Depends(get_admin_user)):
+    profiler = get_profiler()
+    if profiler is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No profiling session"
+        )
+    return profiler.status()
+
+@app.get("/api/admin/profiler/profile", response_class=PlainTextResponse)
+async def get_profile(admin_user: User = Depends(get_admin_user)):
+    # Collapsed stacks, e.g. `flamegraph.pl profile.txt > profile.svg` or open in speedscope
+    profiler = get_profiler()
+    if profiler is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No profiling session"
+        )
+    return profiler.collapsed()
+
+@app.get("/api/admin/slow-requests", response_model=SlowRequestLog)
+async def get_slow_request_log(admin_user: User = Depends(get_admin_user)):
+    return {
+        "thresholdMs": get_slow_request_threshold_ms(),
+        "requests": get_slow_requests()
+    }
+
+@app.put("/api/admin/slow-requests/threshold", response_model=SlowRequestLog)
+async def set_slow_request_threshold(
+    threshold_ms: Optional[float] = Query(default=None, gt=0),
+    admin_user: User = Depends(get_admin_user)
+):
+    # Omitting threshold_ms turns capture off
+    set_slow_request_threshold_ms(threshold_ms)
+    log_action(admin_user["id"], "set_slow_request_threshold", {"thresholdMs": threshold_ms})
+    return {
+        "thresholdMs": get_slow_request_threshold_ms(),
+        "requests": get_slow_requests()
+    }
+
 # For direct running (development)
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run("api.main:app", host="0.0.0.0", port=3000, reload=True)
\ No newline at end of file
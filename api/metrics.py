@@ -0,0 +1,184 @@
+import contextvars
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from api.database import get_estimate_period_value
+from api.deadline import deadline_expired
+from api.profiling import run_profiled
+from api.yahoo_finance import get_estimate_calendar, get_valuation_inputs
+
+# Derived valuation metrics computed for many tickers at once.
+#
+# Per-ticker Yahoo inputs are gathered (and cached) as plain floats, then all
+# metrics are computed as whole-array NumPy operations, so a large screen
+# costs a few vector ops instead of one handler call per ticker.
+METRICS_INPUT_TTL_SECONDS = 60
+MAX_METRICS_TICKERS = 1000
+# Upstream fetches for one batch run on a shared pool of this many threads
+METRICS_FETCH_CONCURRENCY = 16
+
+# Per-ticker data status in batch responses. Once the request deadline passes
+# no further upstream fetches are started: the remaining tickers fall back to
+# their last cached inputs, even if expired, or are reported as missing.
+STATUS_OK = "ok"
+STATUS_STALE = "stale"
+STATUS_MISSING = "missing"
+
+# Order of the cached Yahoo input fields for one ticker
+YAHOO_INPUT_FIELDS = (
+    "price", "trailingPE", "marketCap", "forwardEps", "growth5y", "targetMean",
+    "changePercent", "recommendationMean"
+)
+FIELD_INDEX = {name: i for i, name in enumerate(YAHOO_INPUT_FIELDS)}
+
+_NAN = float("nan")
+_MISSING_INPUTS = (_NAN,) * len(YAHOO_INPUT_FIELDS)
+# ticker -> (expires at, inputs), least recently used first; expired entries
+# are kept as a stale fallback until the LRU bound pushes them out
+MAX_METRICS_INPUT_ENTRIES = 10000
+_yahoo_inputs_cache: "OrderedDict[str, Tuple[float, Tuple[float, ...]]]" = OrderedDict()
+_yahoo_inputs_lock = threading.Lock()
+
+def _get_cached_inputs(ticker: str) -> Optional[Tuple[float, Tuple[float, ...]]]:
+    with _yahoo_inputs_lock:
+        cached = _yahoo_inputs_cache.get(ticker)
+        if cached is not None:
+            _yahoo_inputs_cache.move_to_end(ticker)
+        return cached
+
+def _cache_inputs(ticker: str, expires_at: float, inputs: Tuple[float, ...]):
+    with _yahoo_inputs_lock:
+        _yahoo_inputs_cache[ticker] = (expires_at, inputs)
+        _yahoo_inputs_cache.move_to_end(ticker)
+        while len(_yahoo_inputs_cache) > MAX_METRICS_INPUT_ENTRIES:
+            _yahoo_inputs_cache.popitem(last=False)
+
+def _fetch_yahoo_inputs(ticker: str) -> Tuple[float, ...]:
+    inputs = get_valuation_inputs(ticker)
+    return tuple(inputs[name] for name in YAHOO_INPUT_FIELDS)
+
+def get_yahoo_inputs(ticker: str, now: Optional[float] = None) -> Tuple[Tuple[float, ...], str]:
+    """
+    Yahoo inputs for one ticker, cached for METRICS_INPUT_TTL_SECONDS, and their status
+    """
+    now = time.time() if now is None else now
+    cached = _get_cached_inputs(ticker)
+    if cached is not None and cached[0] > now:
+        return cached[1], STATUS_OK
+    if not deadline_expired():
+        try:
+            inputs = _fetch_yahoo_inputs(ticker)
+        except Exception:
+            # Missing data only blanks this ticker's metrics; failures are not cached
+            inputs = None
+        if inputs is not None:
+            _cache_inputs(ticker, now + METRICS_INPUT_TTL_SECONDS, inputs)
+            return inputs, STATUS_OK
+    if cached is not None:
+        return cached[1], STATUS_STALE
+    return _MISSING_INPUTS, STATUS_MISSING
+
+def _get_user_inputs(ticker: str, user_id: Optional[int]) -> Tuple[float, float]:
+    if user_id is None:
+        return _NAN, _NAN
+    earnings = get_estimate_period_value("earnings", ticker, user_id, "nextYear")
+    growth = get_estimate_period_value("growth", ticker, user_id, "next5Years")
+    if earnings != earnings and growth != growth:
+        return _NAN, _NAN  # nothing saved, so no need for the fiscal calendar
+    # Re-key to the current fiscal periods, if the ticker's calendar is known
+    calendar = get_estimate_calendar(ticker)
+    if calendar is None:
+        return earnings, growth
+    return (
+        get_estimate_period_value("earnings", ticker, user_id, "nextYear", calendar),
+        get_estimate_period_value("growth", ticker, user_id, "next5Years", calendar)
+    )
+
+def compute_valuation_metrics(inputs, user_inputs) -> Dict[str, "np.ndarray"]:
+    """
+    Vectorized metrics from an (n, len(YAHOO_INPUT_FIELDS)) Yahoo input array
+    and an (n, 2) user input array
+    """
+    import numpy as np
+
+    price = inputs[:, FIELD_INDEX["price"]]
+    forward_eps = inputs[:, FIELD_INDEX["forwardEps"]]
+    growth = inputs[:, FIELD_INDEX["growth5y"]]
+    target_mean = inputs[:, FIELD_INDEX["targetMean"]]
+    user_eps, user_growth = user_inputs.T
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # P/E and PEG are meaningless for non-positive earnings or growth
+        forward_pe = np.where(forward_eps > 0, price / forward_eps, np.nan)
+        peg = np.where(growth > 0, forward_pe / growth, np.nan)
+        implied_upside = np.where(price > 0, (target_mean / price - 1) * 100, np.nan)
+        user_forward_pe = np.where(user_eps > 0, price / user_eps, np.nan)
+        user_peg = np.where(user_growth > 0, user_forward_pe / user_growth, np.nan)
+
+    return {
+        "forwardPE": forward_pe,
+        "pegRatio": peg,
+        "impliedUpside": implied_upside,
+        "userForwardPE": user_forward_pe,
+        "userPegRatio": user_peg
+    }
+
+_fetch_pool: Optional[ThreadPoolExecutor] = None
+_fetch_pool_lock = threading.Lock()
+
+def _get_fetch_pool() -> ThreadPoolExecutor:
+    global _fetch_pool
+    with _fetch_pool_lock:
+        if _fetch_pool is None:
+            _fetch_pool = ThreadPoolExecutor(
+                max_workers=METRICS_FETCH_CONCURRENCY, thread_name_prefix="metrics-fetch"
+            )
+        return _fetch_pool
+
+def get_yahoo_input_table(tickers: List[str]):
+    """
+    (n, len(YAHOO_INPUT_FIELDS)) Yahoo input array and the status of each row
+    """
+    import numpy as np
+
+    now = time.time()
+    if len(tickers) <= 1:
+        rows = [get_yahoo_inputs(ticker, now) for ticker in tickers]
+    else:
+        # Tickers are fetched concurrently; each task runs in a copy of the
+        # caller's context so it sees the request deadline
+        pool = _get_fetch_pool()
+        futures = [
+            pool.submit(
+                contextvars.copy_context().run, run_profiled, get_yahoo_inputs, ticker, now
+            )
+            for ticker in tickers
+        ]
+        rows = [future.result() for future in futures]
+    inputs = np.array(
+        [row[0] for row in rows], dtype=np.float64
+    ).reshape(len(tickers), len(YAHOO_INPUT_FIELDS))
+    return inputs, [row[1] for row in rows]
+
+def get_valuation_metrics(tickers: List[str], user_id: Optional[int] = None) -> List[Dict]:
+    import numpy as np
+
+    inputs, statuses = get_yahoo_input_table(tickers)
+    user_inputs = np.array(
+        [_get_user_inputs(ticker, user_id) for ticker in tickers], dtype=np.float64
+    ).reshape(len(tickers), 2)
+
+    metrics = compute_valuation_metrics(inputs, user_inputs)
+    names = ["price", "trailingPE", "marketCap", *metrics]
+    table = np.column_stack([inputs[:, :3], *metrics.values()])
+
+    # Round and turn NaN into None for the whole table at once
+    rows = np.round(table, 4).astype(object)
+    rows[np.isnan(table)] = None
+    return [
+        {"symbol": ticker, **dict(zip(names, row)), "dataStatus": data_status}
+        for ticker, row, data_status in zip(tickers, rows.tolist(), statuses)
+    ]
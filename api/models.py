@@ -1,6 +1,7 @@
 from pydantic import BaseModel, Field, EmailStr
 from typing import Dict, List, Optional, Union
-from datetime import datetime
+from datetime import date, datetime
+from enum import Enum
 
 # Authentication models
 class Token(BaseModel):
@@ -26,6 +27,9 @@ class User(UserBase):
 # Finance models
 class Period(BaseModel):
     label: str
+    fiscalPeriod: Optional[str] = None  # absolute, e.g. "FY2027Q1"
+    startDate: Optional[date] = None
+    endDate: Optional[date] = None
     yahooEstimate: float
     lowEstimate: float
     highEstimate: float
@@ -34,6 +38,8 @@ class Period(BaseModel):
 class EstimateBase(BaseModel):
     ticker: str
     userId: int
+    # Absolute fiscal period of each period key, e.g. {"nextQtr": "FY2027Q2"}; set by the server
+    fiscalPeriods: Dict[str, str] = {}
     createdAt: datetime = Field(default_factory=datetime.now)
     updatedAt: datetime = Field(default_factory=datetime.now)
 
@@ -46,6 +52,17 @@ class RevenueEstimate(EstimateBase):
 class GrowthEstimate(EstimateBase):
     periods: Dict[str, float]  # keys: currentQtr, nextQtr, currentYear, nextYear, next5Years, past5Years
 
+class EstimateKind(str, Enum):
+    earnings = "earnings"
+    revenue = "revenue"
+    growth = "growth"
+
+class EstimateRevision(BaseModel):
+    timestamp: datetime
+    periods: Dict[str, float]
+    fiscalPeriods: Dict[str, str] = {}
+    changed: List[str]  # period keys that differ from the previous revision
+
 class SearchResult(BaseModel):
     symbol: str
     shortname: str
@@ -90,6 +107,9 @@ class YahooFinanceRevenueData(BaseModel):
 
 class GrowthPeriod(BaseModel):
     label: str
+    fiscalPeriod: Optional[str] = None
+    startDate: Optional[date] = None
+    endDate: Optional[date] = None
     estimate: float
 
 class YahooFinanceGrowthData(BaseModel):
@@ -98,4 +118,69 @@ class YahooFinanceGrowthData(BaseModel):
     currentYear: GrowthPeriod
     nextYear: GrowthPeriod
     next5Years: GrowthPeriod
-    past5Years: GrowthPeriod
\ No newline at end of file
+    past5Years: GrowthPeriod
+
+# Aggregate ticker page; sections that did not finish before the request
+# deadline are served from their last good value (stale) or left out (missing)
+class StockOverview(BaseModel):
+    symbol: str
+    stock: Optional[StockData] = None
+    analyst: Optional[AnalystData] = None
+    earnings: Optional[YahooFinanceEarningsData] = None
+    revenue: Optional[YahooFinanceRevenueData] = None
+    growth: Optional[YahooFinanceGrowthData] = None
+    missing: List[str] = []
+    stale: List[str] = []
+
+class ValuationMetrics(BaseModel):
+    symbol: str
+    price: Optional[float] = None
+    trailingPE: Optional[float] = None
+    marketCap: Optional[float] = None
+    forwardPE: Optional[float] = None
+    pegRatio: Optional[float] = None
+    impliedUpside: Optional[float] = None  # percent to the mean analyst target
+    userForwardPE: Optional[float] = None
+    userPegRatio: Optional[float] = None
+    dataStatus: str = "ok"  # "stale" or "missing" when upstream data ran out of time
+
+class ScreenerRow(BaseModel):
+    symbol: str
+    price: Optional[float] = None
+    changePercent: Optional[float] = None
+    marketCap: Optional[float] = None
+    trailingPE: Optional[float] = None
+    recommendationMean: Optional[float] = None
+    growth5y: Optional[float] = None
+    forwardPE: Optional[float] = None
+    pegRatio: Optional[float] = None
+    impliedUpside: Optional[float] = None
+
+class ScreenerResponse(BaseModel):
+    asOf: datetime
+    total: int
+    offset: int
+    limit: int
+    results: List[ScreenerRow]
+
+# Admin profiling
+class ProfilerStatus(BaseModel):
+    running: bool
+    startedAt: datetime
+    durationSeconds: float
+    fraction: float
+    intervalMs: float
+    profiledRequests: int
+    samples: int
+    distinctStacks: int
+
+class SlowRequest(BaseModel):
+    method: str
+    path: str
+    status: Optional[int] = None
+    at: datetime
+    breakdownMs: Dict[str, float]  # auth, validation, upstream, handler, serialization, other, total
+
+class SlowRequestLog(BaseModel):
+    thresholdMs: Optional[float] = None  # None when capture is off
+    requests: List[SlowRequest]
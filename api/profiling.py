@@ -0,0 +1,432 @@
+import asyncio
+import functools
+import inspect
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from fastapi.routing import APIRoute
+
+# Production profiling hooks, both off by default:
+#
+# - An on-demand sampling profiler. A background thread snapshots, at a fixed
+#   interval, the stacks of the threads currently running profiled requests:
+#   the event loop while one of their tasks is running, and worker threads
+#   while they run one of their blocking calls (run_profiled). Stacks are
+#   aggregated as collapsed stacks ("frame;frame;frame count"), the input
+#   format of flamegraph.pl, speedscope and inferno.
+# - Slow request capture. Requests slower than a threshold are kept with a
+#   timing breakdown (auth, validation, upstream, handler, serialization).
+#
+# While both are off, the middleware and the timing spans reduce to a couple
+# of global and context variable lookups per request.
+
+# e.g. SLOW_REQUEST_THRESHOLD_MS=500; can also be changed at runtime by an admin
+_threshold_env = os.environ.get("SLOW_REQUEST_THRESHOLD_MS")
+_slow_threshold_seconds: Optional[float] = (
+    float(_threshold_env) / 1000 if _threshold_env else None
+)
+MAX_SLOW_REQUESTS = 100
+_slow_requests: deque = deque(maxlen=MAX_SLOW_REQUESTS)
+
+DEFAULT_SAMPLE_INTERVAL_SECONDS = 0.005
+MAX_PROFILE_DURATION_SECONDS = 600
+MAX_STACK_DEPTH = 128
+
+class RequestTimings:
+    __slots__ = (
+        "started", "spans", "route_started", "route_finished",
+        "endpoint_started", "endpoint_finished"
+    )
+
+    def __init__(self, started: float):
+        self.started = started
+        # (name, seconds); appended from worker threads too, list.append is atomic
+        self.spans: List = []
+        self.route_started = self.route_finished = None
+        self.endpoint_started = self.endpoint_finished = None
+
+    def span_total(self, name: str) -> float:
+        return sum(seconds for span_name, seconds in self.spans if span_name == name)
+
+    def breakdown(self, finished: float) -> Dict[str, float]:
+        """
+        Milliseconds per stage. Spans from concurrent work (e.g. the overview
+        sections) are summed, so "upstream" can exceed wall time.
+        """
+        total = finished - self.started
+        auth = self.span_total("auth")
+        upstream = self.span_total("upstream")
+        validation = handler = serialization = 0.0
+        if self.route_started is not None and self.endpoint_started is not None:
+            # Request parsing, dependencies (including auth) and input validation
+            validation = max(self.endpoint_started - self.route_started - auth, 0.0)
+        if self.endpoint_finished is not None:
+            handler = max(self.endpoint_finished - self.endpoint_started - upstream, 0.0)
+            if self.route_finished is not None:
+                # Response model validation and JSON encoding
+                serialization = self.route_finished - self.endpoint_finished
+        stages = {
+            "auth": auth,
+            "validation": validation,
+            "upstream": upstream,
+            "handler": handler,
+            "serialization": serialization,
+        }
+        stages["other"] = max(total - sum(stages.values()), 0.0)
+        stages["total"] = total
+        return {name: round(seconds * 1000, 3) for name, seconds in stages.items()}
+
+_timings: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+# Set for requests picked by the sampling profiler
+_profiled: ContextVar[bool] = ContextVar("profiled_request", default=False)
+
+class _Span:
+    __slots__ = ("timings", "name", "started")
+
+    def __init__(self, timings: RequestTimings, name: str):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.timings.spans.append((self.name, time.perf_counter() - self.started))
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+def span(name: str):
+    """
+    Context manager timing a stage of the current request, if it is being captured
+    """
+    timings = _timings.get()
+    return _NULL_SPAN if timings is None else _Span(timings, name)
+
+def _timed_endpoint(endpoint):
+    # Marks when the endpoint itself starts and returns, which splits the time
+    # spent before it (validation) from the time spent after it (serialization)
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def timed(*args, **kwargs):
+            timings = _timings.get()
+            if timings is None:
+                return await endpoint(*args, **kwargs)
+            timings.endpoint_started = time.perf_counter()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                timings.endpoint_finished = time.perf_counter()
+    else:
+        # Plain functions run on a threadpool worker, which is sampled while
+        # it serves a profiled request
+        @functools.wraps(endpoint)
+        def timed(*args, **kwargs):
+            timings = _timings.get()
+            if timings is None:
+                return run_profiled(endpoint, *args, **kwargs)
+            timings.endpoint_started = time.perf_counter()
+            try:
+                return run_profiled(endpoint, *args, **kwargs)
+            finally:
+                timings.endpoint_finished = time.perf_counter()
+    return timed
+
+class ProfiledRoute(APIRoute):
+    """
+    APIRoute recording stage timestamps for captured requests
+    """
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def timed_handler(request):
+            timings = _timings.get()
+            if timings is None:
+                return await handler(request)
+            timings.route_started = time.perf_counter()
+            try:
+                return await handler(request)
+            finally:
+                timings.route_finished = time.perf_counter()
+
+        return timed_handler
+
+# Slow request capture
+def get_slow_request_threshold_ms() -> Optional[float]:
+    return None if _slow_threshold_seconds is None else _slow_threshold_seconds * 1000
+
+def set_slow_request_threshold_ms(threshold_ms: Optional[float]):
+    # None turns capture off
+    global _slow_threshold_seconds
+    _slow_threshold_seconds = None if threshold_ms is None else threshold_ms / 1000
+
+def get_slow_requests() -> List[Dict]:
+    # Most recent first
+    return list(reversed(_slow_requests))
+
+def clear_slow_requests():
+    _slow_requests.clear()
+
+# Sampling profiler
+_IDLE_LEAVES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("thread.py", "_worker"),
+}
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+class SamplingProfiler:
+    """
+    Samples the stacks of threads running profiled requests.
+
+    A fraction of 1.0 profiles every request; lower fractions pick requests
+    at random. Only threads working on a picked request are walked, so the
+    samples and their cost scale with the sampled share of traffic.
+    """
+
+    def __init__(
+        self,
+        duration_seconds: float,
+        fraction: float = 1.0,
+        interval_seconds: float = DEFAULT_SAMPLE_INTERVAL_SECONDS
+    ):
+        self.duration_seconds = duration_seconds
+        self.fraction = fraction
+        self.interval_seconds = interval_seconds
+        self.started_at = time.time()
+        self.ends_at = time.monotonic() + duration_seconds
+        self.active_requests = 0
+        self.profiled_requests = 0
+        self.sample_count = 0
+        self.stacks: Counter = Counter()
+        # Asyncio tasks of profiled requests, the threads running their event
+        # loops, and worker thread id -> profiled calls running on it
+        self._tasks = set()
+        self._loops: Dict[int, asyncio.AbstractEventLoop] = {}
+        self._threads: Counter = Counter()
+        self._state_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+
+    @property
+    def running(self) -> bool:
+        return not self._stopped.is_set()
+
+    def should_profile(self) -> bool:
+        return self.running and (self.fraction >= 1.0 or random.random() < self.fraction)
+
+    def request_started(self, task: asyncio.Task):
+        with self._state_lock:
+            self.profiled_requests += 1
+            self.active_requests += 1
+            self._tasks.add(task)
+            self._loops[threading.get_ident()] = task.get_loop()
+
+    def request_finished(self, task: asyncio.Task):
+        with self._state_lock:
+            self.active_requests -= 1
+            self._tasks.discard(task)
+
+    def thread_started(self, thread_id: int):
+        with self._state_lock:
+            self._threads[thread_id] += 1
+
+    def thread_finished(self, thread_id: int):
+        with self._state_lock:
+            self._threads[thread_id] -= 1
+            if self._threads[thread_id] <= 0:
+                del self._threads[thread_id]
+
+    def _profiled_threads(self) -> set:
+        with self._state_lock:
+            thread_ids = set(self._threads)
+            for thread_id, loop in self._loops.items():
+                # The task the loop is running right now, if any
+                if asyncio.current_task(loop) in self._tasks:
+                    thread_ids.add(thread_id)
+        return thread_ids
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stopped.wait(self.interval_seconds):
+            if time.monotonic() >= self.ends_at:
+                self._stopped.set()
+                break
+            if self.active_requests > 0:
+                self._sample(own_id)
+
+    def _sample(self, own_id: int):
+        thread_ids = self._profiled_threads()
+        thread_ids.discard(own_id)
+        if not thread_ids:
+            return
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        frames = sys._current_frames()
+        for thread_id in thread_ids:
+            frame = frames.get(thread_id)
+            if frame is None:
+                continue
+            code = frame.f_code
+            if (os.path.basename(code.co_filename), code.co_name) in _IDLE_LEAVES:
+                continue
+            labels = []
+            while frame is not None and len(labels) < MAX_STACK_DEPTH:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            labels.append(names.get(thread_id, str(thread_id)))
+            self.stacks[";".join(reversed(labels))] += 1
+        self.sample_count += 1
+
+    def collapsed(self) -> str:
+        """
+        Collapsed stacks, one "root;...;leaf count" line per distinct stack
+        """
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def status(self) -> Dict:
+        return {
+            "running": self.running,
+            "startedAt": datetime.fromtimestamp(self.started_at),
+            "durationSeconds": self.duration_seconds,
+            "fraction": self.fraction,
+            "intervalMs": self.interval_seconds * 1000,
+            "profiledRequests": self.profiled_requests,
+            "samples": self.sample_count,
+            "distinctStacks": len(self.stacks),
+        }
+
+_profiler: Optional[SamplingProfiler] = None
+_profiler_lock = threading.Lock()
+
+def start_profiler(
+    duration_seconds: float,
+    fraction: float = 1.0,
+    interval_seconds: float = DEFAULT_SAMPLE_INTERVAL_SECONDS
+) -> SamplingProfiler:
+    """
+    Start a profiling session; raises RuntimeError if one is already running
+    """
+    global _profiler
+    if not 0 < duration_seconds <= MAX_PROFILE_DURATION_SECONDS:
+        raise ValueError(f"Duration must be between 0 and {MAX_PROFILE_DURATION_SECONDS} seconds")
+    if not 0 < fraction <= 1:
+        raise ValueError("Fraction must be between 0 and 1")
+    with _profiler_lock:
+        if _profiler is not None and _profiler.running:
+            raise RuntimeError("A profiling session is already running")
+        _profiler = SamplingProfiler(duration_seconds, fraction, interval_seconds)
+        _profiler.start()
+        return _profiler
+
+def run_profiled(func, *args, **kwargs):
+    """
+    Call func, sampling the current thread meanwhile if it works for a
+    profiled request. For blocking calls made off the event loop.
+    """
+    profiler = _profiler
+    if profiler is None or not _profiled.get():
+        return func(*args, **kwargs)
+    thread_id = threading.get_ident()
+    profiler.thread_started(thread_id)
+    try:
+        return func(*args, **kwargs)
+    finally:
+        profiler.thread_finished(thread_id)
+
+def stop_profiler() -> Optional[SamplingProfiler]:
+    profiler = _profiler
+    if profiler is not None:
+        profiler.stop()
+    return profiler
+
+def get_profiler() -> Optional[SamplingProfiler]:
+    # The latest session, running or finished; its samples are kept until the next start
+    return _profiler
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware feeding the sampling profiler and slow request capture
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        profiler = _profiler
+        threshold = _slow_threshold_seconds
+        if scope["type"] != "http" or (
+            threshold is None and (profiler is None or not profiler.running)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        profiled = profiler is not None and profiler.should_profile()
+        if profiled:
+            task = asyncio.current_task()
+            profiler.request_started(task)
+            profiled_token = _profiled.set(True)
+        if threshold is None:
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                if profiled:
+                    _profiled.reset(profiled_token)
+                    profiler.request_finished(task)
+            return
+
+        timings = RequestTimings(time.perf_counter())
+        token = _timings.set(timings)
+        response_status = None
+
+        async def send_with_status(message):
+            nonlocal response_status
+            if message["type"] == "http.response.start":
+                response_status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _timings.reset(token)
+            if profiled:
+                _profiled.reset(profiled_token)
+                profiler.request_finished(task)
+            finished = time.perf_counter()
+            if finished - timings.started >= threshold:
+                _slow_requests.append({
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": response_status,
+                    "at": datetime.now(),
+                    "breakdownMs": timings.breakdown(finished),
+                })
@@ -0,0 +1,242 @@
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Tuple
+from urllib.parse import parse_qs
+
+from api.auth import get_username_from_token
+
+# Request rate limiting using GCRA (generic cell rate algorithm). Each client
+# key keeps a single number, its theoretical arrival time (TAT), so a check is
+# one dict lookup and one store. A limit of N requests per period allows a
+# burst of N, refilled evenly across the period.
+RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "1") != "0"
+# Optional shared backend so limits hold across workers, e.g. redis://host:6379/0
+RATE_LIMIT_REDIS_URL = os.environ.get("RATE_LIMIT_REDIS_URL")
+# Only trust X-Forwarded-For when running behind proxies that set it: the
+# number of trusted proxies in front of the app (0 = none). Each proxy
+# appends the address it saw, so the client is that many entries from the
+# right; anything further left was supplied by the client itself.
+RATE_LIMIT_TRUST_PROXY = int(os.environ.get("RATE_LIMIT_TRUST_PROXY") or 0)
+
+class RateLimit(NamedTuple):
+    requests: int
+    period_seconds: float
+
+# Limits per route group. Login and registration are tight because every
+# attempt costs a bcrypt hash.
+RATE_LIMITS: Dict[str, RateLimit] = {
+    "auth": RateLimit(10, 60),
+    "search": RateLimit(60, 60),
+    "stock": RateLimit(300, 60),
+    "estimates": RateLimit(120, 60),
+    # Charged per ticker (see get_request_cost): each uncached ticker costs an
+    # upstream call, so the burst is one full-size request
+    "metrics": RateLimit(1000, 60),
+    "default": RateLimit(300, 60),
+}
+
+# Groups keyed by client IP even when a token is present
+IP_KEYED_GROUPS = {"auth"}
+
+def get_route_group(path: str) -> Optional[str]:
+    if path in ("/api/token", "/api/register"):
+        return "auth"
+    if path.startswith("/api/search"):
+        return "search"
+    if path.startswith("/api/stock/"):
+        return "stock"
+    if path.startswith("/api/estimates/"):
+        return "estimates"
+    if path == "/api/metrics":
+        return "metrics"
+    if path.startswith("/api/"):
+        return "default"
+    return None
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    remaining: int
+    reset_seconds: float  # until the full quota is available again
+    retry_after_seconds: float  # until the next request is allowed, 0 if allowed
+
+def get_request_cost(scope, group: str) -> int:
+    # Tokens a request takes from its group's quota
+    if group != "metrics":
+        return 1
+    tickers = parse_qs(scope["query_string"].decode("latin-1")).get("tickers", [""])[-1]
+    return max(sum(1 for ticker in tickers.split(",") if ticker.strip()), 1)
+
+def _gcra(
+    tat: float, now: float, limit: RateLimit, cost: int = 1
+) -> Tuple[float, RateLimitResult]:
+    emission_interval = limit.period_seconds / limit.requests
+    tat = max(tat, now)
+    # A request never costs more than a full quota, so it can always succeed eventually
+    new_tat = tat + emission_interval * min(cost, limit.requests)
+    allow_at = new_tat - limit.period_seconds
+    if now < allow_at:
+        return tat, RateLimitResult(False, 0, tat - now, allow_at - now)
+    remaining = int((now - allow_at) / emission_interval)
+    return new_tat, RateLimitResult(True, remaining, new_tat - now, 0.0)
+
+class InMemoryRateLimitBackend:
+    """
+    Per-process GCRA state: key -> theoretical arrival time, least recently
+    seen key first
+    """
+    MAX_KEYS = 100000
+
+    def __init__(self):
+        self._tats: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key: str, limit: RateLimit, now: float, cost: int = 1) -> RateLimitResult:
+        with self._lock:
+            tats = self._tats
+            previous = tats.get(key)
+            tat, result = _gcra(0.0 if previous is None else previous, now, limit, cost)
+            if previous is not None:
+                tats.move_to_end(key)
+            if result.allowed:
+                tats[key] = tat
+                if previous is None:
+                    self._evict(now)
+            return result
+
+    def _evict(self, now: float):
+        # Pops from the least recently seen end, amortized O(1) per insert. Keys
+        # whose TAT has passed are back at a full quota and can be dropped; past
+        # MAX_KEYS the least recently seen client goes, so clients that are
+        # actively being limited keep their state.
+        tats = self._tats
+        while tats:
+            key = next(iter(tats))
+            if tats[key] > now and len(tats) <= self.MAX_KEYS:
+                break
+            tats.popitem(last=False)
+
+class RedisRateLimitBackend:
+    """
+    GCRA state shared through Redis, updated atomically with a Lua script
+    """
+    _SCRIPT = """
+    local now = tonumber(ARGV[1])
+    local interval = tonumber(ARGV[2])
+    local period = tonumber(ARGV[3])
+    local tat = math.max(tonumber(redis.call('GET', KEYS[1]) or 0), now)
+    local new_tat = tat + interval
+    if now < new_tat - period then
+        return {0, tostring(tat)}
+    end
+    redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil((new_tat - now) * 1000))
+    return {1, tostring(new_tat)}
+    """
+
+    def __init__(self, url: str):
+        # redis is optional and only needed when a shared backend is configured
+        import redis
+        self._client = redis.Redis.from_url(url)
+        self._script = self._client.register_script(self._SCRIPT)
+
+    def hit(self, key: str, limit: RateLimit, now: float, cost: int = 1) -> RateLimitResult:
+        emission_interval = limit.period_seconds / limit.requests
+        increment = emission_interval * min(cost, limit.requests)
+        allowed, tat = self._script(
+            keys=[f"ratelimit:{key}"], args=[now, increment, limit.period_seconds]
+        )
+        tat = float(tat)
+        if not allowed:
+            allow_at = tat + increment - limit.period_seconds
+            return RateLimitResult(False, 0, tat - now, allow_at - now)
+        remaining = int((now - (tat - limit.period_seconds)) / emission_interval)
+        return RateLimitResult(True, remaining, tat - now, 0.0)
+
+def get_rate_limit_backend():
+    if RATE_LIMIT_REDIS_URL:
+        return RedisRateLimitBackend(RATE_LIMIT_REDIS_URL)
+    return InMemoryRateLimitBackend()
+
+def _get_header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+def get_client_key(scope, group: str) -> str:
+    if group not in IP_KEYED_GROUPS:
+        authorization = _get_header(scope, b"authorization")
+        if authorization and authorization[:7].lower() == "bearer ":
+            username = get_username_from_token(authorization[7:])
+            if username is not None:
+                return f"user:{username}"
+
+    if RATE_LIMIT_TRUST_PROXY:
+        # Repeated headers count as one comma-separated list
+        forwarded = [
+            address.strip()
+            for key, value in scope["headers"] if key == b"x-forwarded-for"
+            for address in value.decode("latin-1").split(",")
+        ]
+        if len(forwarded) >= RATE_LIMIT_TRUST_PROXY:
+            return f"ip:{forwarded[-RATE_LIMIT_TRUST_PROXY]}"
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+class RateLimitMiddleware:
+    """
+    ASGI middleware enforcing RATE_LIMITS and adding RateLimit-* headers
+    """
+
+    def __init__(self, app, limits: Dict[str, RateLimit] = RATE_LIMITS, backend=None):
+        self.app = app
+        self.limits = limits
+        self.backend = backend if backend is not None else InMemoryRateLimitBackend()
+        # Headers that only depend on the group's limit are encoded once
+        self._static_headers = {
+            group: [
+                (b"ratelimit-limit", str(limit.requests).encode()),
+                (b"ratelimit-policy", f"{limit.requests};w={int(limit.period_seconds)}".encode()),
+            ]
+            for group, limit in limits.items()
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+        group = get_route_group(scope["path"])
+        limit = self.limits.get(group) if group is not None else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        key = f"{group}:{get_client_key(scope, group)}"
+        result = self.backend.hit(key, limit, time.time(), get_request_cost(scope, group))
+        headers = self._static_headers[group] + [
+            (b"ratelimit-remaining", b"%d" % result.remaining),
+            (b"ratelimit-reset", b"%d" % math.ceil(result.reset_seconds)),
+        ]
+
+        if not result.allowed:
+            body = b'{"detail":"Too many requests"}'
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": headers + [
+                    (b"retry-after", b"%d" % math.ceil(result.retry_after_seconds)),
+                    (b"content-type", b"application/json"),
+                    (b"content-length", b"%d" % len(body)),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", ()), *headers]
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
@@ -0,0 +1,179 @@
+import operator
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from api.deadline import no_deadline
+from api.metrics import FIELD_INDEX, compute_valuation_metrics, get_yahoo_input_table
+
+# Server-side screener over a columnar snapshot of the symbol universe.
+#
+# The snapshot is a NumPy structured array rebuilt in the background every
+# SCREENER_REFRESH_SECONDS. A rebuild fills a brand new array and then swaps
+# the module-level reference in a single assignment, so a query always sees
+# either the old table or the new one, never a half-built table.
+SCREENER_REFRESH_SECONDS = 300
+DEFAULT_SCREENER_UNIVERSE = (
+    "AAPL,MSFT,AMZN,GOOGL,META,NVDA,TSLA,BRK-B,JPM,V,JNJ,WMT,PG,MA,UNH,HD,XOM,CVX,"
+    "KO,PEP,ABBV,MRK,LLY,AVGO,COST,ORCL,CSCO,ADBE,CRM,NFLX,INTC,AMD,QCOM,TXN,IBM,"
+    "BAC,WFC,GS,MS,DIS,NKE,MCD,SBUX,BA,CAT,GE,HON,UPS,T,VZ"
+)
+SCREENER_UNIVERSE = [
+    symbol.strip()
+    for symbol in os.environ.get("SCREENER_UNIVERSE", DEFAULT_SCREENER_UNIVERSE).split(",")
+    if symbol.strip()
+]
+MAX_SCREEN_LIMIT = 500
+
+# Columns that can be filtered and sorted on
+SCREENER_FIELDS = (
+    "price", "changePercent", "marketCap", "trailingPE", "recommendationMean",
+    "growth5y", "forwardPE", "pegRatio", "impliedUpside"
+)
+
+class ScreenerSnapshot(NamedTuple):
+    built_at: float
+    table: "np.ndarray"  # structured array: symbol plus SCREENER_FIELDS
+
+_snapshot: Optional[ScreenerSnapshot] = None
+_rebuild_lock = threading.Lock()
+
+def build_snapshot(universe: List[str]) -> ScreenerSnapshot:
+    import numpy as np
+
+    inputs, _ = get_yahoo_input_table(universe)
+    user_inputs = np.full((len(universe), 2), np.nan)
+    metrics = compute_valuation_metrics(inputs, user_inputs)
+
+    symbol_width = max((len(symbol) for symbol in universe), default=1)
+    dtype = [("symbol", f"U{symbol_width}")] + [(name, "f8") for name in SCREENER_FIELDS]
+    table = np.empty(len(universe), dtype=dtype)
+    table["symbol"] = universe
+    for name in ("price", "changePercent", "marketCap", "trailingPE", "recommendationMean", "growth5y"):
+        table[name] = inputs[:, FIELD_INDEX[name]]
+    for name in ("forwardPE", "pegRatio", "impliedUpside"):
+        table[name] = metrics[name]
+    return ScreenerSnapshot(time.time(), table)
+
+def rebuild_snapshot(wait: bool = False):
+    global _snapshot
+    # Only one rebuild at a time; queries keep using the current snapshot
+    if not _rebuild_lock.acquire(blocking=wait):
+        return
+    try:
+        if wait and _snapshot is not None:
+            return  # built by another caller while we waited
+        # The snapshot is shared by every later query, so it is built in full
+        # even when the request that triggered it has a shorter deadline
+        with no_deadline():
+            _snapshot = build_snapshot(SCREENER_UNIVERSE)
+    finally:
+        _rebuild_lock.release()
+
+def get_snapshot() -> ScreenerSnapshot:
+    snapshot = _snapshot
+    if snapshot is None:
+        # The first query has nothing to fall back on, so it builds synchronously
+        rebuild_snapshot(wait=True)
+        return _snapshot
+    if time.time() - snapshot.built_at > SCREENER_REFRESH_SECONDS and not _rebuild_lock.locked():
+        threading.Thread(target=rebuild_snapshot, daemon=True).start()
+    return snapshot
+
+_OPERATORS = {
+    ">=": operator.ge,
+    "<=": operator.le,
+    "!=": operator.ne,
+    "==": operator.eq,
+    ">": operator.gt,
+    "<": operator.lt,
+}
+_FILTER_PATTERN = re.compile(r"^\s*(\w+)\s*(>=|<=|!=|==|>|<)\s*(\S+)\s*$")
+
+class ScreenFilter(NamedTuple):
+    field: str
+    op: str
+    value: float
+
+def parse_filter(expression: str) -> ScreenFilter:
+    """
+    Parse a filter like "marketCap>=1e9" or "trailingPE<30"
+    """
+    match = _FILTER_PATTERN.match(expression)
+    if match is None:
+        raise ValueError(f"Invalid filter: {expression}")
+    field, op, value = match.groups()
+    if field not in SCREENER_FIELDS:
+        raise ValueError(f"Unknown screener field: {field}")
+    try:
+        return ScreenFilter(field, op, float(value))
+    except ValueError:
+        raise ValueError(f"Invalid filter value: {value}")
+
+def parse_sort(sort: str) -> Tuple[str, bool]:
+    # "-marketCap" sorts descending
+    descending = sort.startswith("-")
+    field = sort.lstrip("+-")
+    if field not in SCREENER_FIELDS:
+        raise ValueError(f"Unknown screener field: {field}")
+    return field, descending
+
+def screen(
+    filters: List[ScreenFilter],
+    sort: Optional[Tuple[str, bool]] = None,
+    limit: int = 50,
+    offset: int = 0,
+    snapshot: Optional[ScreenerSnapshot] = None
+) -> Dict:
+    import numpy as np
+
+    snapshot = snapshot if snapshot is not None else get_snapshot()
+    table = snapshot.table
+
+    # Rows with a missing (NaN) value never pass a filter on that field
+    mask = np.ones(len(table), dtype=bool)
+    for screen_filter in filters:
+        column = table[screen_filter.field]
+        mask &= _OPERATORS[screen_filter.op](column, screen_filter.value) & ~np.isnan(column)
+    matched = np.flatnonzero(mask)
+    total = len(matched)
+
+    end = min(offset + limit, total)
+    if offset >= end:
+        page = matched[:0]
+    elif sort is None:
+        page = matched[offset:end]
+    else:
+        field, descending = sort
+        keys = table[field][matched]
+        keys = -keys if descending else keys.copy()
+        keys[np.isnan(keys)] = np.inf  # missing values sort last
+        if end < total:
+            # Only the first `end` rows need ordering. Partitioning picks an
+            # arbitrary subset of rows tied at the boundary, so take every row
+            # up to the boundary value and stable-sort those: ties keep row
+            # order and pages never overlap.
+            boundary = np.partition(keys, end - 1)[end - 1]
+            top = np.flatnonzero(keys <= boundary)
+            order = top[np.argsort(keys[top], kind="stable")][:end]
+        else:
+            order = np.argsort(keys, kind="stable")
+        page = matched[order[offset:end]]
+
+    rows = table[page]
+    numeric = np.column_stack([rows[name] for name in SCREENER_FIELDS])
+    values = np.round(numeric, 4).astype(object)
+    values[np.isnan(numeric)] = None
+    return {
+        "asOf": datetime.fromtimestamp(snapshot.built_at),
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "results": [
+            {"symbol": symbol, **dict(zip(SCREENER_FIELDS, row))}
+            for symbol, row in zip(rows["symbol"].tolist(), values.tolist())
+        ]
+    }
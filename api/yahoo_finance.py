@@ -1,53 +1,187 @@
-import requests
 import json
-from typing import Dict, List, Any, Optional
-from datetime import datetime
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Tuple
+from datetime import date, datetime, timezone
+
+from api.deadline import DeadlineExceeded, bounded_timeout, check_deadline, deadline_expired
+from api.fiscal_calendar import FiscalCalendar, anchor_for, get_fiscal_calendar
+from api.profiling import span
 
 # Base URL for Yahoo Finance API
-YAHOO_FINANCE_API_BASE = "https://query1.finance.yahoo.com/v10/finance"
+YAHOO_FINANCE_API_BASE = os.environ.get("YAHOO_FINANCE_API_BASE", "https://query1.finance.yahoo.com")
 RAPID_API_KEY = None  # Will need to be set via environment or config
 
+# Upstream calls are off by default and the mock payloads below are parsed
+# instead. Set YAHOO_FINANCE_LIVE=1 to call YAHOO_FINANCE_API_BASE, e.g. the
+# local mock server used by the benchmarks.
+YAHOO_FINANCE_LIVE = os.environ.get("YAHOO_FINANCE_LIVE") == "1"
+UPSTREAM_TIMEOUT_SECONDS = 10
+
+# Fetchers run on threadpool workers; requests.Session is not thread-safe,
+# so each thread keeps its own
+_local = threading.local()
+
+def _get_session():
+    session = getattr(_local, "session", None)
+    if session is None:
+        # requests is imported here rather than at module level to keep API
+        # cold start fast; the session reuses upstream connections
+        import requests
+        session = _local.session = requests.Session()
+    return session
+
+def _fetch_json(path: str, params: Dict[str, str]) -> Dict[str, Any]:
+    session = _get_session()
+    # Never wait on upstream past the request's own deadline
+    timeout = bounded_timeout(UPSTREAM_TIMEOUT_SECONDS)
+    with span("upstream"):
+        try:
+            response = session.get(
+                f"{YAHOO_FINANCE_API_BASE}{path}", params=params, timeout=timeout
+            )
+        except Exception:
+            if deadline_expired():
+                raise DeadlineExceeded()
+            raise
+        response.raise_for_status()
+        return response.json()
+
+def _get_quote_summary(ticker: str, modules: str) -> Dict[str, Any]:
+    check_deadline()
+    if YAHOO_FINANCE_LIVE:
+        data = _fetch_json(f"/v10/finance/quoteSummary/{ticker}", {"modules": modules})
+    else:
+        data = mock_quote_summary(ticker, modules)
+    return data["quoteSummary"]["result"][0]
+
+def _get_trend_periods(ticker: str) -> Dict[str, Dict[str, Any]]:
+    trend = _get_quote_summary(ticker, "earningsTrend")["earningsTrend"]["trend"]
+    return {item["period"]: item for item in trend}
+
+# Yahoo earningsTrend period codes for each estimate period
+TREND_PERIODS = {
+    "currentQtr": "0q",
+    "nextQtr": "+1q",
+    "currentYear": "0y",
+    "nextYear": "+1y",
+    "next5Years": "+5y",
+    "past5Years": "-5y"
+}
+
+# A company's fiscal year end rarely changes; cache it per ticker for a day.
+# Both caches are least recently used first; expired entries are kept as a
+# fallback for estimates while upstream is unreachable, until evicted.
+FISCAL_YEAR_END_TTL_SECONDS = 24 * 60 * 60
+# Yahoo moves "0q" on when a quarter's results are reported
+QUARTER_DATE_TTL_SECONDS = 60 * 60
+MAX_FISCAL_CACHE_ENTRIES = 10000
+# ticker -> (expires at, month)
+_fiscal_year_end_cache: "OrderedDict[str, Tuple[float, int]]" = OrderedDict()
+# ticker -> (expires at, date in the quarter estimate periods are labeled from)
+_quarter_date_cache: "OrderedDict[str, Tuple[float, date]]" = OrderedDict()
+_fiscal_cache_lock = threading.Lock()
+
+def _cache_get(cache: OrderedDict, ticker: str):
+    with _fiscal_cache_lock:
+        value = cache.get(ticker)
+        if value is not None:
+            cache.move_to_end(ticker)
+        return value
+
+def _cache_put(cache: OrderedDict, ticker: str, value):
+    with _fiscal_cache_lock:
+        cache[ticker] = value
+        cache.move_to_end(ticker)
+        while len(cache) > MAX_FISCAL_CACHE_ENTRIES:
+            cache.popitem(last=False)
+
+def get_fiscal_year_end_month(ticker: str) -> int:
+    """
+    Month (1-12) in which the ticker's fiscal year ends
+    """
+    now = time.time()
+    cached = _cache_get(_fiscal_year_end_cache, ticker)
+    if cached is not None and cached[0] > now:
+        return cached[1]
+    try:
+        statistics = _get_quote_summary(ticker, "defaultKeyStatistics")["defaultKeyStatistics"]
+        last_fiscal_year_end = statistics["lastFiscalYearEnd"]["raw"]
+        month = datetime.fromtimestamp(last_fiscal_year_end, timezone.utc).month
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        raise Exception(f"Failed to fetch fiscal year end: {str(e)}")
+    _cache_put(_fiscal_year_end_cache, ticker, (now + FISCAL_YEAR_END_TTL_SECONDS, month))
+    return month
+
+def _trend_calendar(ticker: str, trend: Dict[str, Dict[str, Any]]) -> FiscalCalendar:
+    # Periods are labeled from the quarter Yahoo reports as current ("0q"),
+    # which trails the clock until the last quarter's results are reported;
+    # the clock is the fallback when "0q" has no usable end date. The date is
+    # remembered so estimates are saved against the quarter the page shows.
+    try:
+        quarter_date = date.fromisoformat(trend["0q"]["endDate"])
+    except (KeyError, TypeError, ValueError):
+        quarter_date = date.today()
+    calendar = get_fiscal_calendar(get_fiscal_year_end_month(ticker), quarter_date)
+    _cache_put(_quarter_date_cache, ticker, (time.time() + QUARTER_DATE_TTL_SECONDS, quarter_date))
+    return calendar
+
+def get_estimate_calendar(ticker: str) -> Optional[FiscalCalendar]:
+    """
+    Fiscal calendar a ticker's estimate periods are labeled with, for saving
+    and reading estimates. Fetches what is not cached; while upstream is
+    unreachable, the last known calendar is used as long as it is the
+    current or previous quarter by the clock.
+
+    Returns None if the calendar cannot be determined: periods keyed by a
+    guessed calendar would silently change meaning once the real one is known.
+    """
+    now = time.time()
+    cached = _cache_get(_quarter_date_cache, ticker)
+    try:
+        if cached is not None and cached[0] > now:
+            return get_fiscal_calendar(get_fiscal_year_end_month(ticker), cached[1])
+        return _trend_calendar(ticker, _get_trend_periods(ticker))
+    except DeadlineExceeded:
+        raise
+    except Exception:
+        pass
+    known_month = _cache_get(_fiscal_year_end_cache, ticker)
+    if known_month is None or cached is None:
+        return None
+    calendar = get_fiscal_calendar(known_month[1], cached[1])
+    if 0 <= anchor_for(known_month[1], date.today()) - calendar.anchor <= 1:
+        return calendar
+    return None
+
+def _estimate_periods(ticker: str, module: str, year_ago_key: str) -> Dict[str, Any]:
+    trend = _get_trend_periods(ticker)
+    metadata = _trend_calendar(ticker, trend).metadata
+    result = {}
+    for period in ("currentQtr", "nextQtr", "currentYear", "nextYear"):
+        estimate = trend[TREND_PERIODS[period]][module]
+        result[period] = {
+            **metadata[period],
+            "yahooEstimate": estimate["avg"]["raw"],
+            "lowEstimate": estimate["low"]["raw"],
+            "highEstimate": estimate["high"]["raw"],
+            "yearAgo": estimate[year_ago_key]["raw"]
+        }
+    return result
+
 def get_stock_data(ticker: str) -> Dict[str, Any]:
     """
     Fetch basic stock data for a given ticker symbol
     """
-    url = f"{YAHOO_FINANCE_API_BASE}/quoteSummary/{ticker}"
-    params = {
-        "modules": "price,summaryDetail"
-    }
-    
     try:
-        # For demonstration, we're using a mock response
-        # In production, uncomment this:
-        # response = requests.get(url, params=params)
-        # data = response.json()
-        
-        # Mock data
-        data = {
-            "quoteSummary": {
-                "result": [{
-                    "price": {
-                        "symbol": ticker,
-                        "shortName": f"{ticker} Inc.",
-                        "longName": f"{ticker} Corporation",
-                        "regularMarketPrice": {"raw": 150.25},
-                        "regularMarketChange": {"raw": 2.75},
-                        "regularMarketChangePercent": {"raw": 1.86},
-                        "regularMarketDayHigh": {"raw": 152.5},
-                        "regularMarketDayLow": {"raw": 149.0},
-                        "regularMarketVolume": {"raw": 3500000},
-                    },
-                    "summaryDetail": {
-                        "trailingPE": {"raw": 25.6},
-                        "marketCap": {"raw": 2500000000}
-                    }
-                }]
-            }
-        }
-        
-        price_data = data["quoteSummary"]["result"][0]["price"]
-        summary_data = data["quoteSummary"]["result"][0]["summaryDetail"]
-        
+        result = _get_quote_summary(ticker, "price,summaryDetail")
+        price_data = result["price"]
+        summary_data = result["summaryDetail"]
+
         return {
             "symbol": price_data["symbol"],
             "shortName": price_data["shortName"],
@@ -61,6 +195,8 @@ def get_stock_data(ticker: str) -> Dict[str, Any]:
             "trailingPE": summary_data["trailingPE"]["raw"],
             "marketCap": summary_data["marketCap"]["raw"]
         }
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         raise Exception(f"Failed to fetch stock data: {str(e)}")
 
@@ -68,29 +204,32 @@ def get_analyst_data(ticker: str) -> Dict[str, Any]:
     """
     Fetch analyst ratings and recommendations for a ticker
     """
-    url = f"{YAHOO_FINANCE_API_BASE}/quoteSummary/{ticker}"
-    params = {
-        "modules": "financialData,recommendationTrend"
-    }
-    
     try:
-        # Mock data
-        return {
-            "targetHighPrice": 180.0,
-            "targetLowPrice": 120.0,
-            "targetMeanPrice": 165.0,
-            "targetMedianPrice": 167.5,
-            "recommendationMean": 2.3,
-            "recommendationKey": "buy",
-            "numberOfAnalystOpinions": 28,
+        result = _get_quote_summary(ticker, "financialData,recommendationTrend")
+        financial_data = result["financialData"]
+        trend = result["recommendationTrend"]["trend"][0]
+
+        data = {
+            "targetHighPrice": financial_data["targetHighPrice"]["raw"],
+            "targetLowPrice": financial_data["targetLowPrice"]["raw"],
+            "targetMeanPrice": financial_data["targetMeanPrice"]["raw"],
+            "targetMedianPrice": financial_data["targetMedianPrice"]["raw"],
+            "recommendationMean": financial_data["recommendationMean"]["raw"],
+            "recommendationKey": financial_data["recommendationKey"],
+            "numberOfAnalystOpinions": financial_data["numberOfAnalystOpinions"]["raw"],
             "recommendationTrends": {
-                "strongBuy": 8,
-                "buy": 12,
-                "hold": 6,
-                "sell": 2,
-                "strongSell": 0
+                "strongBuy": trend["strongBuy"],
+                "buy": trend["buy"],
+                "hold": trend["hold"],
+                "sell": trend["sell"],
+                "strongSell": trend["strongSell"]
             }
         }
+        if "currentPrice" in financial_data:
+            data["currentPrice"] = financial_data["currentPrice"]["raw"]
+        return data
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         raise Exception(f"Failed to fetch analyst data: {str(e)}")
 
@@ -99,37 +238,9 @@ def get_earnings_estimates(ticker: str) -> Dict[str, Any]:
     Fetch earnings estimates for a ticker
     """
     try:
-        # Mock data
-        return {
-            "currentQtr": {
-                "label": "Current Quarter (Q3 2023)",
-                "yahooEstimate": 2.35,
-                "lowEstimate": 2.12,
-                "highEstimate": 2.58,
-                "yearAgo": 2.10
-            },
-            "nextQtr": {
-                "label": "Next Quarter (Q4 2023)",
-                "yahooEstimate": 2.45,
-                "lowEstimate": 2.25,
-                "highEstimate": 2.65,
-                "yearAgo": 2.20
-            },
-            "currentYear": {
-                "label": "Current Year (2023)",
-                "yahooEstimate": 9.25,
-                "lowEstimate": 8.75,
-                "highEstimate": 9.95,
-                "yearAgo": 8.50
-            },
-            "nextYear": {
-                "label": "Next Year (2024)",
-                "yahooEstimate": 10.50,
-                "lowEstimate": 9.75,
-                "highEstimate": 11.25,
-                "yearAgo": 9.25
-            }
-        }
+        return _estimate_periods(ticker, "earningsEstimate", "yearAgoEps")
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         raise Exception(f"Failed to fetch earnings estimates: {str(e)}")
 
@@ -138,37 +249,9 @@ def get_revenue_estimates(ticker: str) -> Dict[str, Any]:
     Fetch revenue estimates for a ticker
     """
     try:
-        # Mock data
-        return {
-            "currentQtr": {
-                "label": "Current Quarter (Q3 2023)",
-                "yahooEstimate": 15.2e9,
-                "lowEstimate": 14.8e9,
-                "highEstimate": 15.7e9,
-                "yearAgo": 14.1e9
-            },
-            "nextQtr": {
-                "label": "Next Quarter (Q4 2023)",
-                "yahooEstimate": 16.4e9,
-                "lowEstimate": 15.9e9,
-                "highEstimate": 16.9e9,
-                "yearAgo": 15.1e9
-            },
-            "currentYear": {
-                "label": "Current Year (2023)",
-                "yahooEstimate": 58.5e9,
-                "lowEstimate": 57.2e9,
-                "highEstimate": 59.8e9,
-                "yearAgo": 53.8e9
-            },
-            "nextYear": {
-                "label": "Next Year (2024)",
-                "yahooEstimate": 65.3e9,
-                "lowEstimate": 63.1e9,
-                "highEstimate": 67.5e9,
-                "yearAgo": 58.5e9
-            }
-        }
+        return _estimate_periods(ticker, "revenueEstimate", "yearAgoRevenue")
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         raise Exception(f"Failed to fetch revenue estimates: {str(e)}")
 
@@ -177,43 +260,186 @@ def get_growth_estimates(ticker: str) -> Dict[str, Any]:
     Fetch growth estimates for a ticker
     """
     try:
-        # Mock data
-        return {
-            "currentQtr": {
-                "label": "Current Quarter (Q3 2023)",
-                "estimate": 8.5
-            },
-            "nextQtr": {
-                "label": "Next Quarter (Q4 2023)",
-                "estimate": 9.2
-            },
-            "currentYear": {
-                "label": "Current Year (2023)",
-                "estimate": 8.8
-            },
-            "nextYear": {
-                "label": "Next Year (2024)",
-                "estimate": 11.5
-            },
-            "next5Years": {
-                "label": "Next 5 Years (per annum)",
-                "estimate": 12.8
-            },
-            "past5Years": {
-                "label": "Past 5 Years (per annum)",
-                "estimate": 9.7
+        trend = _get_trend_periods(ticker)
+        metadata = _trend_calendar(ticker, trend).metadata
+        result = {}
+        for period, code in TREND_PERIODS.items():
+            result[period] = {
+                **metadata[period],
+                # Yahoo reports growth as a fraction, the API as a percentage
+                "estimate": round(trend[code]["growth"]["raw"] * 100, 2)
             }
-        }
+        return result
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         raise Exception(f"Failed to fetch growth estimates: {str(e)}")
 
+def get_valuation_inputs(ticker: str) -> Dict[str, float]:
+    """
+    Inputs of the batch valuation metrics for a ticker, from a single
+    quoteSummary call with each module requested once
+    """
+    try:
+        result = _get_quote_summary(ticker, "price,summaryDetail,financialData,earningsTrend")
+        price_data = result["price"]
+        summary_data = result["summaryDetail"]
+        financial_data = result["financialData"]
+        trend = {item["period"]: item for item in result["earningsTrend"]["trend"]}
+        return {
+            "price": price_data["regularMarketPrice"]["raw"],
+            "trailingPE": summary_data["trailingPE"]["raw"],
+            "marketCap": summary_data["marketCap"]["raw"],
+            "forwardEps": trend[TREND_PERIODS["nextYear"]]["earningsEstimate"]["avg"]["raw"],
+            # Yahoo reports growth as a fraction, the API as a percentage
+            "growth5y": round(trend[TREND_PERIODS["next5Years"]]["growth"]["raw"] * 100, 2),
+            "targetMean": financial_data["targetMeanPrice"]["raw"],
+            "changePercent": price_data["regularMarketChangePercent"]["raw"],
+            "recommendationMean": financial_data["recommendationMean"]["raw"],
+        }
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        raise Exception(f"Failed to fetch valuation inputs: {str(e)}")
+
 def search_stocks(query: str) -> List[Dict[str, Any]]:
     """
     Search for stocks by ticker or company name
     """
     try:
-        # Mock data
+        check_deadline()
+        if YAHOO_FINANCE_LIVE:
+            data = _fetch_json("/v1/finance/search", {"q": query})
+        else:
+            data = mock_search(query)
         return [
+            {
+                "symbol": quote["symbol"],
+                "shortname": quote["shortname"],
+                "longname": quote.get("longname"),
+                "exchDisp": quote["exchDisp"],
+                "typeDisp": quote["typeDisp"]
+            }
+            for quote in data["quotes"]
+        ]
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        raise Exception(f"Failed to search stocks: {str(e)}")
+
+# Mock upstream payloads, shaped like Yahoo's quoteSummary and search responses
+def _raw(value) -> Dict[str, Any]:
+    return {"raw": value}
+
+def _trend_estimate(avg, low, high, year_ago, year_ago_key):
+    return {"avg": _raw(avg), "low": _raw(low), "high": _raw(high), year_ago_key: _raw(year_ago)}
+
+# Fiscal year end months of mocked tickers; others end in December
+MOCK_FISCAL_YEAR_END_MONTHS = {
+    "AAPL": 9, "MSFT": 6, "NVDA": 1, "WMT": 1, "ORCL": 5, "CSCO": 7, "NKE": 5,
+    "COST": 8, "ADBE": 11, "V": 9, "PG": 6, "HD": 1, "CRM": 1, "DIS": 9, "SBUX": 9
+}
+
+def _mock_last_fiscal_year_end(ticker: str) -> int:
+    # Epoch seconds of the most recent fiscal year end, as Yahoo reports it
+    month = MOCK_FISCAL_YEAR_END_MONTHS.get(ticker, 12)
+    today = date.today()
+    year = today.year if today.month > month else today.year - 1
+    next_month = date(year + month // 12, month % 12 + 1, 1)
+    end = date.fromordinal(next_month.toordinal() - 1)
+    return int(datetime(end.year, end.month, end.day, tzinfo=timezone.utc).timestamp())
+
+def mock_quote_summary(ticker: str, modules: str) -> Dict[str, Any]:
+    result: Dict[str, Any] = {}
+    for module in modules.split(","):
+        if module == "price":
+            result["price"] = {
+                "symbol": ticker,
+                "shortName": f"{ticker} Inc.",
+                "longName": f"{ticker} Corporation",
+                "regularMarketPrice": _raw(150.25),
+                "regularMarketChange": _raw(2.75),
+                "regularMarketChangePercent": _raw(1.86),
+                "regularMarketDayHigh": _raw(152.5),
+                "regularMarketDayLow": _raw(149.0),
+                "regularMarketVolume": _raw(3500000),
+            }
+        elif module == "summaryDetail":
+            result["summaryDetail"] = {
+                "trailingPE": _raw(25.6),
+                "marketCap": _raw(2500000000)
+            }
+        elif module == "financialData":
+            result["financialData"] = {
+                "targetHighPrice": _raw(180.0),
+                "targetLowPrice": _raw(120.0),
+                "targetMeanPrice": _raw(165.0),
+                "targetMedianPrice": _raw(167.5),
+                "recommendationMean": _raw(2.3),
+                "recommendationKey": "buy",
+                "numberOfAnalystOpinions": _raw(28)
+            }
+        elif module == "recommendationTrend":
+            result["recommendationTrend"] = {
+                "trend": [{
+                    "period": "0m",
+                    "strongBuy": 8,
+                    "buy": 12,
+                    "hold": 6,
+                    "sell": 2,
+                    "strongSell": 0
+                }]
+            }
+        elif module == "defaultKeyStatistics":
+            last_fiscal_year_end = _mock_last_fiscal_year_end(ticker)
+            result["defaultKeyStatistics"] = {
+                "lastFiscalYearEnd": {
+                    "raw": last_fiscal_year_end,
+                    "fmt": datetime.fromtimestamp(last_fiscal_year_end, timezone.utc).strftime("%Y-%m-%d")
+                }
+            }
+        elif module == "earningsTrend":
+            periods = get_fiscal_calendar(MOCK_FISCAL_YEAR_END_MONTHS.get(ticker, 12)).periods
+            end_dates = {name: period.end.isoformat() for name, period in periods.items()}
+            result["earningsTrend"] = {
+                "trend": [
+                    {
+                        "period": "0q",
+                        "endDate": end_dates["currentQtr"],
+                        "growth": _raw(0.085),
+                        "earningsEstimate": _trend_estimate(2.35, 2.12, 2.58, 2.10, "yearAgoEps"),
+                        "revenueEstimate": _trend_estimate(15.2e9, 14.8e9, 15.7e9, 14.1e9, "yearAgoRevenue")
+                    },
+                    {
+                        "period": "+1q",
+                        "endDate": end_dates["nextQtr"],
+                        "growth": _raw(0.092),
+                        "earningsEstimate": _trend_estimate(2.45, 2.25, 2.65, 2.20, "yearAgoEps"),
+                        "revenueEstimate": _trend_estimate(16.4e9, 15.9e9, 16.9e9, 15.1e9, "yearAgoRevenue")
+                    },
+                    {
+                        "period": "0y",
+                        "endDate": end_dates["currentYear"],
+                        "growth": _raw(0.088),
+                        "earningsEstimate": _trend_estimate(9.25, 8.75, 9.95, 8.50, "yearAgoEps"),
+                        "revenueEstimate": _trend_estimate(58.5e9, 57.2e9, 59.8e9, 53.8e9, "yearAgoRevenue")
+                    },
+                    {
+                        "period": "+1y",
+                        "endDate": end_dates["nextYear"],
+                        "growth": _raw(0.115),
+                        "earningsEstimate": _trend_estimate(10.50, 9.75, 11.25, 9.25, "yearAgoEps"),
+                        "revenueEstimate": _trend_estimate(65.3e9, 63.1e9, 67.5e9, 58.5e9, "yearAgoRevenue")
+                    },
+                    {"period": "+5y", "growth": _raw(0.128)},
+                    {"period": "-5y", "growth": _raw(0.097)}
+                ]
+            }
+    return {"quoteSummary": {"result": [result], "error": None}}
+
+def mock_search(query: str) -> Dict[str, Any]:
+    return {
+        "quotes": [
             {
                 "symbol": "AAPL",
                 "shortname": "Apple Inc.",
@@ -236,9 +462,8 @@ def search_stocks(query: str) -> List[Dict[str, Any]]:
                 "typeDisp": "Equity"
             }
         ]
-    except Exception as e:
-        raise Exception(f"Failed to search stocks: {str(e)}")
+    }
 
-# Note: In a production environment, these functions would make real API calls
-# and handle things like rate limiting, authentication, etc. The mock data is 
-# just for demonstration purposes.
\ No newline at end of file
+# Note: In a production environment, these functions would also handle things
+# like rate limiting and authentication. The mock data is just for
+# demonstration purposes.
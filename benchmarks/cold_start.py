@@ -0,0 +1,173 @@
+"""
+Cold start budget check for the API process.
+
+Measures, in fresh interpreters, the cumulative `python -X importtime` cost
+of `api.main` and the wall time from process start to the first response.
+
+Exits non-zero if a dependency that should load lazily is imported at
+startup, if the first response costs more than --first-response-ratio times
+the import of api.main, or if either time exceeds its budget. Budgets
+default to the checked-in baseline below times --headroom, and can be set
+with --budget-ms and --first-response-budget-ms. To check a branch against
+numbers measured on the same machine instead, save a report with --output
+and pass it to --compare with a --threshold.
+
+    python -m benchmarks.cold_start
+    python -m benchmarks.cold_start --budget-ms 600 --first-response-budget-ms 800
+    python -m benchmarks.cold_start --output base.json
+    python -m benchmarks.cold_start --compare base.json --threshold 0.2
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import List
+
+# Median times on the reference development machine. Update them when startup
+# cost changes on purpose; the default budgets leave --headroom on top.
+BASELINE_IMPORT_MS = 485.0
+BASELINE_FIRST_RESPONSE_MS = 580.0
+DEFAULT_HEADROOM = 2.0
+
+# Dependencies that must not be imported just by loading the app
+LAZY_MODULES = ("sqlalchemy", "passlib", "jose", "requests", "uvicorn", "numpy")
+
+FIRST_REQUEST_SCRIPT = """
+import asyncio
+from api.main import app
+
+async def first_request():
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "path": "/api/stock/AAPL", "raw_path": b"/api/stock/AAPL",
+        "query_string": b"", "root_path": "", "headers": [(b"host", b"localhost")],
+        "client": ("127.0.0.1", 1), "server": ("localhost", 80),
+    }
+    status = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    await app(scope, receive, send)
+    assert status == [200], status
+
+asyncio.run(first_request())
+"""
+
+def _run(args, cwd):
+    env = dict(os.environ, PYTHONPATH=cwd, PYTHONDONTWRITEBYTECODE="")
+    return subprocess.run(
+        [sys.executable, *args], cwd=cwd, env=env, capture_output=True, text=True, check=True
+    )
+
+def measure_import_us(cwd: str) -> int:
+    result = _run(["-X", "importtime", "-c", "import api.main"], cwd)
+    for line in result.stderr.splitlines():
+        parts = [part.strip() for part in line.split("|")]
+        if len(parts) == 3 and parts[2] == "api.main":
+            return int(parts[1])
+    raise RuntimeError("api.main not found in importtime output")
+
+def eagerly_loaded(cwd: str):
+    result = _run(["-c", "import sys, api.main; print('\\n'.join(sys.modules))"], cwd)
+    loaded = set(result.stdout.split())
+    return sorted(name for name in LAZY_MODULES if name in loaded)
+
+def measure_first_response_ms(cwd: str) -> float:
+    started = time.perf_counter()
+    _run(["-c", FIRST_REQUEST_SCRIPT], cwd)
+    return (time.perf_counter() - started) * 1000
+
+def measure_bare_interpreter_ms(cwd: str) -> float:
+    started = time.perf_counter()
+    _run(["-c", "pass"], cwd)
+    return (time.perf_counter() - started) * 1000
+
+def compare(report, baseline, threshold: float) -> List[str]:
+    """
+    List regressions beyond threshold (a fraction) against a baseline report
+    """
+    regressions = []
+    for key in ("importMs", "timeToFirstResponseOverInterpreterMs"):
+        old, new = baseline.get(key), report[key]
+        if old and new > old * (1 + threshold):
+            regressions.append(f"{key} {old} -> {new}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--first-response-ratio", type=float, default=2.0,
+                        help="maximum first response time (over a bare interpreter) "
+                             "as a multiple of the api.main import time")
+    parser.add_argument("--headroom", type=float, default=DEFAULT_HEADROOM,
+                        help="default budgets as a multiple of the checked-in baseline")
+    parser.add_argument("--budget-ms", type=float, default=None,
+                        help="maximum median cumulative import time of api.main")
+    parser.add_argument("--first-response-budget-ms", type=float, default=None,
+                        help="maximum median first response time over a bare interpreter")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--compare", help="baseline JSON report to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.20,
+                        help="allowed regression against --compare as a fraction, default 0.20")
+    args = parser.parse_args()
+    if args.budget_ms is None:
+        args.budget_ms = BASELINE_IMPORT_MS * args.headroom
+    if args.first_response_budget_ms is None:
+        args.first_response_budget_ms = BASELINE_FIRST_RESPONSE_MS * args.headroom
+    cwd = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    # Warm the bytecode cache so every run measures the same thing
+    _run(["-c", "import api.main"], cwd)
+
+    import_ms = statistics.median(measure_import_us(cwd) for _ in range(args.runs)) / 1000
+    bare_ms = statistics.median(measure_bare_interpreter_ms(cwd) for _ in range(args.runs))
+    first_response_ms = statistics.median(measure_first_response_ms(cwd) for _ in range(args.runs))
+    first_response_over_bare_ms = first_response_ms - bare_ms
+    eager = eagerly_loaded(cwd)
+
+    failures = []
+    if eager:
+        failures.append(f"lazy modules imported at startup: {', '.join(eager)}")
+    if first_response_over_bare_ms > args.first_response_ratio * import_ms:
+        failures.append(
+            f"first response {first_response_over_bare_ms:.0f} ms exceeds "
+            f"{args.first_response_ratio}x import time {import_ms:.0f} ms"
+        )
+    if import_ms > args.budget_ms:
+        failures.append(f"import {import_ms:.0f} ms exceeds budget {args.budget_ms:.0f} ms")
+    if first_response_over_bare_ms > args.first_response_budget_ms:
+        failures.append(
+            f"first response {first_response_over_bare_ms:.0f} ms exceeds "
+            f"budget {args.first_response_budget_ms:.0f} ms"
+        )
+
+    report = {
+        "importMs": round(import_ms, 1),
+        "budgetMs": args.budget_ms,
+        "timeToFirstResponseMs": round(first_response_ms, 1),
+        "timeToFirstResponseOverInterpreterMs": round(first_response_over_bare_ms, 1),
+        "firstResponseBudgetMs": args.first_response_budget_ms,
+        "firstResponseRatio": round(first_response_over_bare_ms / import_ms, 2),
+        "maxFirstResponseRatio": args.first_response_ratio,
+        "eagerlyLoadedLazyModules": eager,
+    }
+    if args.compare:
+        with open(args.compare) as f:
+            failures.extend(compare(report, json.load(f), args.threshold))
+    report["failures"] = failures
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
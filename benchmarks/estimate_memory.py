@@ -0,0 +1,97 @@
+"""
+Memory benchmark for saved estimate storage.
+
+Fills the estimate tables with synthetic rows and reports bytes per estimate
+for the compact record layout next to the previous dict-of-dicts layout, then
+extrapolates to 10M rows. Pass --rows 10000000 to measure the full size
+directly (needs several GB of RAM).
+
+    python -m benchmarks.estimate_memory --rows 200000
+"""
+import argparse
+import json
+import random
+import tracemalloc
+from datetime import datetime
+
+from api import database
+from api.fiscal_calendar import get_fiscal_calendar
+
+TARGET_ROWS = 10_000_000
+TICKER_UNIVERSE = 5000
+
+def _make_tickers(count: int):
+    rng = random.Random(0)
+    letters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    tickers = set()
+    while len(tickers) < count:
+        tickers.add("".join(rng.choice(letters) for _ in range(rng.randint(1, 5))))
+    return sorted(tickers)
+
+def _rows(count: int):
+    # Tickers come from request data, so build a fresh string per row as the API would
+    tickers = _make_tickers(TICKER_UNIVERSE)
+    for i in range(count):
+        yield "".join(tickers[i % TICKER_UNIVERSE]), i // TICKER_UNIVERSE + 1
+
+def _periods(i: int):
+    return {
+        "currentQtr": 1.0 + i % 7,
+        "nextQtr": 1.5 + i % 5,
+        "currentYear": 6.0 + i % 3,
+        "nextYear": 7.0 + i % 11
+    }
+
+def measure_records(count: int) -> int:
+    database.earnings_estimates_db.clear()
+    calendar = get_fiscal_calendar(12)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for i, (ticker, user_id) in enumerate(_rows(count)):
+        database.save_earnings_estimate(ticker, user_id, _periods(i), calendar)
+    used = _snapshot_delta(before)
+    tracemalloc.stop()
+    database.earnings_estimates_db.clear()
+    return used
+
+def measure_legacy_dicts(count: int) -> int:
+    # The layout used before slotted records, kept here for comparison
+    table = {}
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for i, (ticker, user_id) in enumerate(_rows(count)):
+        table[f"{ticker}_{user_id}"] = {
+            "ticker": ticker,
+            "userId": user_id,
+            "periods": _periods(i),
+            "createdAt": datetime.now(),
+            "updatedAt": datetime.now()
+        }
+    used = _snapshot_delta(before)
+    tracemalloc.stop()
+    return used
+
+def _snapshot_delta(before) -> int:
+    after = tracemalloc.take_snapshot()
+    return sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=200_000)
+    args = parser.parse_args()
+
+    report = {"rows": args.rows, "extrapolatedRows": TARGET_ROWS}
+    for name, measure in (("records", measure_records), ("legacyDicts", measure_legacy_dicts)):
+        used = measure(args.rows)
+        per_row = used / args.rows
+        report[name] = {
+            "bytesPerEstimate": round(per_row, 1),
+            "extrapolatedMiB": round(per_row * TARGET_ROWS / 2**20, 1)
+        }
+    report["reduction"] = round(
+        1 - report["records"]["bytesPerEstimate"] / report["legacyDicts"]["bytesPerEstimate"], 3
+    )
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
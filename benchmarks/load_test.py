@@ -0,0 +1,348 @@
+"""
+Load test for the API against the local mock Yahoo upstream.
+
+Runs the app in-process (ASGI transport) or as a uvicorn subprocess, drives a
+weighted mix of realistic scenarios from concurrent clients and prints a JSON
+report with throughput, p50/p95/p99 latency and upstream call counts. With
+--compare, exits non-zero if the run regressed against a saved report:
+lower throughput, higher latency percentiles, a higher error rate or more
+upstream calls per operation.
+
+    python -m benchmarks.load_test --duration 10 --concurrency 16 --output main.json
+    python -m benchmarks.load_test --duration 10 --concurrency 16 --compare main.json
+
+Requires httpx (already needed by FastAPI's TestClient).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from api import yahoo_finance
+from benchmarks.mock_yahoo import MockYahooServer
+
+TICKERS = ["AAPL", "MSFT", "AMZN", "GOOG", "META", "NVDA", "TSLA", "JPM", "V", "WMT"]
+SEARCH_TERMS = ["apple", "microsoft", "amazon", "tesla"]
+STOCK_ROUTES = ["", "/analyst", "/earnings", "/revenue", "/growth"]
+BENCH_PASSWORD = "bench-password"
+
+# Scenario weights; override with --mix ticker_page=5,search=3,...
+DEFAULT_MIX = {"ticker_page": 50, "search": 30, "estimate_save": 15, "login": 5}
+
+class Recorder:
+    def __init__(self):
+        self.scenarios: Dict[str, List[float]] = defaultdict(list)
+        self.routes: Dict[str, List[float]] = defaultdict(list)
+        self.scenario_errors: Dict[str, int] = defaultdict(int)
+        self.route_errors: Dict[str, int] = defaultdict(int)
+
+    async def request(self, client, route: str, method: str, url: str, **kwargs) -> bool:
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            ok = response.status_code < 400
+        except Exception:
+            ok = False
+        self.routes[route].append(time.perf_counter() - started)
+        if not ok:
+            self.route_errors[route] += 1
+        return ok
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+def _summarize(samples: List[float], errors: int) -> Dict[str, float]:
+    ordered = sorted(samples)
+    to_ms = lambda seconds: round(seconds * 1000, 3)
+    return {
+        "count": len(ordered),
+        "errors": errors,
+        "meanMs": to_ms(sum(ordered) / len(ordered)) if ordered else 0.0,
+        "p50Ms": to_ms(_percentile(ordered, 0.50)),
+        "p95Ms": to_ms(_percentile(ordered, 0.95)),
+        "p99Ms": to_ms(_percentile(ordered, 0.99)),
+    }
+
+# Scenarios
+async def ticker_page(client, recorder, rng, user):
+    # A browser loads all five stock panels in parallel
+    ticker = rng.choice(TICKERS)
+    results = await asyncio.gather(*(
+        recorder.request(client, f"GET /api/stock/{{ticker}}{route}", "GET", f"/api/stock/{ticker}{route}")
+        for route in STOCK_ROUTES
+    ))
+    return all(results)
+
+async def search(client, recorder, rng, user):
+    # Type-ahead: one request per keystroke after the first two
+    term = rng.choice(SEARCH_TERMS)
+    ok = True
+    for length in range(2, len(term) + 1):
+        ok &= await recorder.request(
+            client, "GET /api/search", "GET", "/api/search", params={"query": term[:length]}
+        )
+    return ok
+
+async def login(client, recorder, rng, user):
+    return await recorder.request(
+        client, "POST /api/token", "POST", "/api/token",
+        data={"username": user["username"], "password": BENCH_PASSWORD}
+    )
+
+async def estimate_save(client, recorder, rng, user):
+    ticker = rng.choice(TICKERS)
+    body = {
+        "ticker": ticker,
+        "userId": user["id"],
+        "periods": {
+            "currentQtr": round(rng.uniform(1, 3), 2),
+            "nextQtr": round(rng.uniform(1, 3), 2),
+            "currentYear": round(rng.uniform(8, 11), 2),
+            "nextYear": round(rng.uniform(9, 12), 2)
+        }
+    }
+    return await recorder.request(
+        client, "POST /api/estimates/{ticker}/earnings", "POST",
+        f"/api/estimates/{ticker}/earnings", json=body,
+        headers={"Authorization": f"Bearer {user['token']}"}
+    )
+
+SCENARIOS = {
+    "ticker_page": ticker_page,
+    "search": search,
+    "login": login,
+    "estimate_save": estimate_save,
+}
+
+async def _create_users(client, count: int):
+    users = []
+    for i in range(count):
+        username = f"bench-user-{i}-{os.getpid()}"
+        response = await client.post("/api/register", json={
+            "username": username, "email": f"{username}@example.com", "password": BENCH_PASSWORD
+        })
+        response.raise_for_status()
+        user = response.json()
+        response = await client.post(
+            "/api/token", data={"username": username, "password": BENCH_PASSWORD}
+        )
+        response.raise_for_status()
+        user["token"] = response.json()["access_token"]
+        users.append(user)
+    return users
+
+async def _worker(client, recorder, mix, users, deadline, seed):
+    rng = random.Random(seed)
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, weights)[0]
+        started = time.perf_counter()
+        ok = await SCENARIOS[name](client, recorder, rng, rng.choice(users))
+        recorder.scenarios[name].append(time.perf_counter() - started)
+        if not ok:
+            recorder.scenario_errors[name] += 1
+
+async def run_load(client, args, mix):
+    users = await _create_users(client, args.users)
+    # Warm up imports, caches and connection pools before measuring
+    for name in mix:
+        await SCENARIOS[name](client, Recorder(), random.Random(0), users[0])
+
+    recorder = Recorder()
+    started = time.perf_counter()
+    deadline = started + args.duration
+    await asyncio.gather(*(
+        _worker(client, recorder, mix, users, deadline, args.seed + i)
+        for i in range(args.concurrency)
+    ))
+    return recorder, time.perf_counter() - started
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+async def _run_in_process(args, mix):
+    import httpx
+    from api.main import app
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        return await run_load(client, args, mix)
+
+async def _run_uvicorn(args, mix, env):
+    import httpx
+    port = _free_port()
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=root, env=env
+    )
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        limits = httpx.Limits(max_connections=args.concurrency * len(STOCK_ROUTES))
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+            for _ in range(100):
+                try:
+                    await client.get("/docs")
+                    break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.1)
+            return await run_load(client, args, mix)
+    finally:
+        process.terminate()
+        process.wait()
+
+def build_report(args, mix, recorder, elapsed, upstream):
+    requests = sum(len(samples) for samples in recorder.routes.values())
+    operations = sum(len(samples) for samples in recorder.scenarios.values())
+    return {
+        "config": {
+            "mode": args.mode,
+            "durationSeconds": args.duration,
+            "concurrency": args.concurrency,
+            "upstreamLatencyMs": args.latency_ms,
+            "upstreamJitterMs": args.jitter_ms,
+            "upstreamErrorRate": args.error_rate,
+            "mix": mix,
+            "rateLimit": args.rate_limit,
+        },
+        "elapsedSeconds": round(elapsed, 3),
+        "throughput": {
+            "requestsPerSecond": round(requests / elapsed, 2),
+            "operationsPerSecond": round(operations / elapsed, 2),
+            "requests": requests,
+            "operations": operations,
+            "errors": sum(recorder.route_errors.values()),
+        },
+        "scenarios": {
+            name: _summarize(samples, recorder.scenario_errors[name])
+            for name, samples in sorted(recorder.scenarios.items())
+        },
+        "routes": {
+            name: _summarize(samples, recorder.route_errors[name])
+            for name, samples in sorted(recorder.routes.items())
+        },
+        "upstream": upstream,
+    }
+
+def compare(report, baseline, threshold: float) -> List[str]:
+    """
+    List regressions beyond threshold (a fraction) against a baseline report
+    """
+    regressions = []
+    old_rps = baseline["throughput"]["requestsPerSecond"]
+    new_rps = report["throughput"]["requestsPerSecond"]
+    if old_rps and new_rps < old_rps * (1 - threshold):
+        regressions.append(f"throughput {old_rps} -> {new_rps} req/s")
+
+    # Fast failures raise throughput and lower latency, so errors are checked
+    # on their own; a baseline without errors tolerates none
+    old_errors = _error_rate(baseline["throughput"])
+    new_errors = _error_rate(report["throughput"])
+    if new_errors > old_errors * (1 + threshold):
+        regressions.append(f"error rate {old_errors:.4f} -> {new_errors:.4f}")
+
+    # Cache regressions show up as more upstream calls for the same work
+    old_calls = _upstream_calls_per_operation(baseline)
+    new_calls = _upstream_calls_per_operation(report)
+    if old_calls is not None and new_calls is not None and new_calls > old_calls * (1 + threshold):
+        regressions.append(f"upstream calls per operation {old_calls:.2f} -> {new_calls:.2f}")
+
+    for name, stats in report["scenarios"].items():
+        old = baseline.get("scenarios", {}).get(name)
+        if not old:
+            continue
+        if stats["count"] and stats["errors"] / stats["count"] > (
+            old["errors"] / old["count"] if old["count"] else 0.0
+        ) * (1 + threshold):
+            regressions.append(f"{name} errors {old['errors']} -> {stats['errors']}")
+        for key in ("p50Ms", "p95Ms", "p99Ms"):
+            if old[key] and stats[key] > old[key] * (1 + threshold):
+                regressions.append(f"{name} {key} {old[key]} -> {stats[key]}")
+    return regressions
+
+def _error_rate(throughput) -> float:
+    return throughput["errors"] / throughput["requests"] if throughput["requests"] else 0.0
+
+def _upstream_calls_per_operation(report) -> Optional[float]:
+    operations = report["throughput"]["operations"]
+    calls = report.get("upstream", {}).get("calls")
+    return calls / operations if operations and calls is not None else None
+
+def _parse_mix(value: str) -> Dict[str, int]:
+    mix = {}
+    for part in value.split(","):
+        name, weight = part.split("=")
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"unknown scenario: {name}")
+        mix[name] = int(weight)
+    return mix
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--mode", choices=("inprocess", "uvicorn"), default="inprocess")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to run")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--mix", type=_parse_mix, default=DEFAULT_MIX)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--rate-limit", action="store_true",
+                        help="keep rate limiting on; it is disabled by default")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--compare", help="baseline JSON report to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="allowed regression as a fraction, default 0.10")
+    args = parser.parse_args()
+
+    upstream = MockYahooServer(
+        ("127.0.0.1", 0), args.latency_ms, args.jitter_ms, args.error_rate, args.seed
+    )
+    upstream.start_in_thread()
+    # The environment configures the uvicorn subprocess; the in-process app
+    # shares this interpreter, where api.yahoo_finance is already imported
+    os.environ["YAHOO_FINANCE_LIVE"] = "1"
+    os.environ["YAHOO_FINANCE_API_BASE"] = upstream.base_url
+    if not args.rate_limit:
+        # All benchmark clients share one IP and a few users
+        os.environ["RATE_LIMIT_ENABLED"] = "0"
+    yahoo_finance.YAHOO_FINANCE_LIVE = True
+    yahoo_finance.YAHOO_FINANCE_API_BASE = upstream.base_url
+
+    try:
+        if args.mode == "inprocess":
+            recorder, elapsed = asyncio.run(_run_in_process(args, args.mix))
+        else:
+            recorder, elapsed = asyncio.run(_run_uvicorn(args, args.mix, dict(os.environ)))
+    finally:
+        upstream.shutdown()
+
+    report = build_report(args, args.mix, recorder, elapsed, upstream.stats())
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Local mock of the Yahoo Finance upstream for benchmarks.
+
+Serves the same payloads as the API's built-in mock data over HTTP, with
+configurable latency and error rate, and counts every call it receives.
+Point the API at it with YAHOO_FINANCE_LIVE=1 and
+YAHOO_FINANCE_API_BASE=http://127.0.0.1:<port>.
+
+    python -m benchmarks.mock_yahoo --port 8900 --latency-ms 40 --error-rate 0.01
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from api.yahoo_finance import mock_quote_summary, mock_search
+
+class MockYahooServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, seed=0):
+        super().__init__(address, _Handler)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.calls = Counter()
+        self.injected_errors = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _next_delay_and_error(self):
+        with self._lock:
+            delay = self.latency_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms)
+            failed = self._random.random() < self.error_rate
+            if failed:
+                self.injected_errors += 1
+        return max(delay, 0.0) / 1000, failed
+
+    def record(self, endpoint: str):
+        with self._lock:
+            self.calls[endpoint] += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "calls": sum(self.calls.values()),
+                "byEndpoint": dict(sorted(self.calls.items())),
+                "injectedErrors": self.injected_errors
+            }
+
+    def start_in_thread(self) -> threading.Thread:
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+
+        if url.path.startswith("/v10/finance/quoteSummary/"):
+            ticker = url.path.rsplit("/", 1)[1]
+            modules = query.get("modules", [""])[0]
+            endpoint = f"quoteSummary?modules={modules}"
+            build = lambda: mock_quote_summary(ticker, modules)
+        elif url.path == "/v1/finance/search":
+            endpoint = "search"
+            build = lambda: mock_search(query.get("q", [""])[0])
+        else:
+            self._send(404, {"error": "not found"})
+            return
+
+        self.server.record(endpoint)
+        delay, failed = self.server._next_delay_and_error()
+        if delay:
+            time.sleep(delay)
+        if failed:
+            self._send(500, {"error": "injected upstream failure"})
+        else:
+            self._send(200, build())
+
+    def _send(self, status: int, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = MockYahooServer(
+        (args.host, args.port), args.latency_ms, args.jitter_ms, args.error_rate
+    )
+    print(f"Mock Yahoo upstream listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(json.dumps(server.stats(), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Overhead of the rate limiting middleware.
+
+Times a trivial ASGI app called directly, with and without
+RateLimitMiddleware in front, for anonymous (IP-keyed) and token-keyed
+requests. Reports nanoseconds per request and the added cost per request.
+Limits are set high enough that no request is rejected.
+
+    python -m benchmarks.rate_limit_overhead --requests 200000
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from api.auth import create_access_token
+from api.rate_limit import InMemoryRateLimitBackend, RateLimit, RateLimitMiddleware
+
+async def _ok_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+async def _receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+async def _send(message):
+    pass
+
+def _scope(path: str, headers, client_ip: str):
+    return {
+        "type": "http", "method": "GET", "path": path,
+        "headers": headers, "client": (client_ip, 50000),
+    }
+
+async def _time(app, scopes, requests: int) -> float:
+    count = len(scopes)
+    started = time.perf_counter()
+    for i in range(requests):
+        await app(scopes[i % count], _receive, _send)
+    return (time.perf_counter() - started) / requests * 1e9
+
+async def run(requests: int, clients: int):
+    limits = {group: RateLimit(10**9, 60) for group in ("auth", "search", "stock", "estimates", "default")}
+    limited = RateLimitMiddleware(_ok_app, limits=limits, backend=InMemoryRateLimitBackend())
+
+    anonymous = [_scope("/api/stock/AAPL", [], f"10.0.{i // 256}.{i % 256}") for i in range(clients)]
+    tokens = [create_access_token({"sub": f"user{i}"}) for i in range(clients)]
+    authenticated = [
+        _scope("/api/search", [(b"authorization", f"Bearer {token}".encode())], "10.0.0.1")
+        for token in tokens
+    ]
+
+    # Warm the token cache and the limiter state
+    await _time(limited, anonymous + authenticated, 2 * clients)
+
+    baseline_ns = await _time(_ok_app, anonymous, requests)
+    anonymous_ns = await _time(limited, anonymous, requests)
+    authenticated_ns = await _time(limited, authenticated, requests)
+    return {
+        "requests": requests,
+        "distinctClients": clients,
+        "baselineNsPerRequest": round(baseline_ns, 1),
+        "ipKeyedNsPerRequest": round(anonymous_ns, 1),
+        "tokenKeyedNsPerRequest": round(authenticated_ns, 1),
+        "ipKeyedOverheadNs": round(anonymous_ns - baseline_ns, 1),
+        "tokenKeyedOverheadNs": round(authenticated_ns - baseline_ns, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=200000)
+    parser.add_argument("--clients", type=int, default=1000)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.requests, args.clients)), indent=2))
+
+if __name__ == "__main__":
+    main()